@@ -0,0 +1,109 @@
+#!/usr/bin/python
+# coding=utf-8
+from __future__ import division, print_function, unicode_literals
+import os
+import tempfile
+import numpy as np
+from .utils import fingerprint
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+
+class StageCache(object):
+    """
+    Persistent, content-addressed cache for the results of stage functions.
+
+    Results are stored in directory under a key derived from the source code
+    of the stage, the arguments it is called with and the seed of the call.
+    If max_size (in bytes) is given the least recently used entries are
+    evicted once the cache grows beyond it. NumPy arrays are stored as .npy
+    files and loaded using mmap_mode (pass None to load them into memory).
+    """
+    def __init__(self, directory, max_size=None, mmap_mode='r'):
+        self.directory = directory
+        self.max_size = max_size
+        self.mmap_mode = mmap_mode
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+    def key(self, source, args, kwargs, seed):
+        """
+        Return the key for a stage call or None if the arguments cannot be
+        hashed (i.e. pickled).
+        """
+        kwargs = [('%s' % k, v) for k, v in sorted(kwargs.items())]
+        return fingerprint(source, (list(args), kwargs, seed))
+
+    def get(self, key):
+        """
+        Return a tuple (found, result) for the given key.
+        """
+        path = self._path(key, '.npy')
+        if os.path.exists(path):
+            result = np.load(path, mmap_mode=self.mmap_mode)
+        else:
+            path = self._path(key, '.pickle')
+            if not os.path.exists(path):
+                return False, None
+            with open(path, 'rb') as f:
+                result = pickle.load(f)
+        os.utime(path, None)  # mark as recently used
+        return True, result
+
+    def put(self, key, result):
+        if isinstance(result, np.ndarray) and not result.dtype.hasobject:
+            ext = '.npy'
+        else:
+            ext = '.pickle'
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                if ext == '.npy':
+                    np.save(f, result)
+                else:
+                    pickle.dump(result, f, protocol=2)
+            # rename is atomic so concurrent runs never see partial entries
+            os.rename(tmp_path, self._path(key, ext))
+        except:
+            os.remove(tmp_path)
+            raise
+        # a key can be overwritten (e.g. checkpoints) with the other format
+        stale_ext = '.pickle' if ext == '.npy' else '.npy'
+        if os.path.exists(self._path(key, stale_ext)):
+            os.remove(self._path(key, stale_ext))
+        if self.max_size is not None:
+            self.evict(self.max_size)
+
+    def evict(self, max_size):
+        """
+        Remove least recently used entries until the cache is not larger than
+        max_size bytes.
+        """
+        entries = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(('.npy', '.pickle')):
+                continue
+            path = os.path.join(self.directory, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:  # removed concurrently
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total_size = sum(e[1] for e in entries)
+        for mtime, size, path in sorted(entries):
+            if total_size <= max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total_size -= size
+
+    def clear(self):
+        self.evict(0)
+
+    def _path(self, key, ext):
+        return os.path.join(self.directory, key + ext)
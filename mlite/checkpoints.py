@@ -0,0 +1,118 @@
+#!/usr/bin/python
+# coding=utf-8
+from __future__ import division, print_function, unicode_literals
+import json
+import os
+import threading
+import numpy as np
+
+DATA_FILE = 'checkpoints.npy'
+INDEX_FILE = 'checkpoints.json'
+
+
+class TopKStore(object):
+    """
+    Keeps copies of the k arrays with the lowest score that were offered.
+
+    Memory for all k arrays is allocated once and offered arrays are copied
+    into the slot of the worst one. If a directory is given the slots live
+    in the memory-mapped file directory/checkpoints.npy (loadable with
+    np.load) and directory/checkpoints.json describes them. Both are written
+    to disk by a background thread, call close() to wait for it. Without a
+    directory the arrays are only kept in memory and lost with the process.
+    """
+    def __init__(self, k, shape, dtype=np.float64, directory=None):
+        self.k = k
+        self.directory = directory
+        if directory is None:
+            self._slots = np.empty((k,) + tuple(shape), dtype=dtype)
+        else:
+            if not os.path.exists(directory):
+                os.makedirs(directory)
+            self._slots = np.lib.format.open_memmap(
+                os.path.join(directory, DATA_FILE), mode='w+', dtype=dtype,
+                shape=(k,) + tuple(shape))
+        self._scores = np.full(k, np.inf)
+        self._steps = [None] * k
+        self._used = 0
+        self._lock = threading.Lock()
+        self._dirty = threading.Event()
+        self._closed = False
+        self._writer = None
+        if directory is not None:
+            self._writer = threading.Thread(target=self._write_loop,
+                                            name='mlite-checkpoint-writer')
+            self._writer.daemon = True
+            self._writer.start()
+
+    def offer(self, score, array, step=None):
+        """
+        Store a copy of array if its score is among the k lowest. Returns the
+        slot it was stored in or None.
+        """
+        if self._used < self.k:
+            slot = self._used
+            self._used += 1
+        else:
+            slot = int(np.argmax(self._scores))
+            if not score < self._scores[slot]:
+                return None
+        with self._lock:
+            np.copyto(self._slots[slot], array)
+            self._scores[slot] = score
+            self._steps[slot] = step
+        self._dirty.set()
+        return slot
+
+    def get(self, slot):
+        return self._slots[slot]
+
+    @property
+    def best(self):
+        """
+        The tuple (score, step, array) of the best stored array.
+        """
+        if self._used == 0:
+            return None
+        slot = int(np.argmin(self._scores))
+        return self._scores[slot], self._steps[slot], self._slots[slot]
+
+    def references(self):
+        """
+        Return a list of dicts with the slot, score and step (and the file if
+        there is a directory) of all stored arrays, best first.
+        """
+        refs = []
+        for slot in np.argsort(self._scores[:self._used], kind='mergesort'):
+            ref = {'slot': int(slot),
+                   'score': float(self._scores[slot]),
+                   'step': self._steps[slot]}
+            if self.directory is not None:
+                ref['file'] = os.path.join(self.directory, DATA_FILE)
+            refs.append(ref)
+        return refs
+
+    def flush(self):
+        if self.directory is None:
+            return
+        self._slots.flush()  # a slot written meanwhile is flushed next time
+        with self._lock:
+            refs = self.references()
+        index_file = os.path.join(self.directory, INDEX_FILE)
+        with open(index_file + '.tmp', 'w') as f:
+            json.dump(refs, f)
+        os.rename(index_file + '.tmp', index_file)
+
+    def close(self):
+        if self._writer is not None:
+            self._closed = True
+            self._dirty.set()
+            self._writer.join()
+            self._writer = None
+        self.flush()
+
+    def _write_loop(self):
+        while not self._closed:
+            self._dirty.wait()
+            self._dirty.clear()
+            self.flush()
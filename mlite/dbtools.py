@@ -0,0 +1,164 @@
+#!/usr/bin/python
+# coding=utf-8
+from __future__ import division, print_function, unicode_literals
+import argparse
+import json
+import sys
+
+
+def common_queries(name=None):
+    """
+    Return (description, filter, sort) of the queries status pages and
+    analyses use most.
+    """
+    return [
+        ('runs of an experiment', {'name': name}, [('start_time', -1)]),
+        ('completed runs of an experiment',
+         {'name': name, 'status': 'COMPLETED'}, [('start_time', -1)]),
+        ('running experiments', {'status': 'RUNNING'}, [('start_time', -1)]),
+        ('runs with lapsed heartbeats',
+         {'status': 'RUNNING', 'heartbeat': {'$lt': 0}}, [('heartbeat', 1)]),
+        ('stored result lookup', {'fingerprint': '', 'status': 'COMPLETED'},
+         [('stop_time', -1)]),
+    ]
+
+
+def describe_plan(explanation):
+    """
+    Summarize the winning plan of an explain() result as its stages from
+    the top, with the used index in parentheses, e.g.
+    'FETCH > IXSCAN(name_1_start_time_-1)'.
+    """
+    plan = explanation['queryPlanner']['winningPlan']
+    plan = plan.get('queryPlan', plan)  # slot based engine
+    stages = []
+    while plan is not None:
+        stage = plan['stage']
+        if 'indexName' in plan:
+            stage += '({})'.format(plan['indexName'])
+        stages.append(stage)
+        inputs = plan.get('inputStages', [])
+        plan = plan.get('inputStage', inputs[0] if inputs else None)
+    return ' > '.join(stages)
+
+
+def explain_queries(collection, name=None):
+    """
+    Return a list of (description, plan) for the common queries.
+    """
+    return [(description,
+             describe_plan(collection.find(query).sort(sort).explain()))
+            for description, query, sort in common_queries(name)]
+
+
+def _connect(args):
+    from .observers.mongodb import MongoDBReporter
+    reporter = MongoDBReporter(args.url, args.db or 'mlizard_experiments',
+                               indexes=())
+    reporter.connect()
+    return reporter.collection
+
+
+def _indexes(args):
+    from .observers.mongodb import (DEFAULT_INDEXES, ensure_indexes,
+                                    missing_indexes, option_index)
+    collection = _connect(args)
+    indexes = list(DEFAULT_INDEXES) + [option_index(k) for k in args.option]
+    if not args.check:
+        for name in ensure_indexes(collection, indexes):
+            print('index', name)
+    missing = missing_indexes(collection, indexes)
+    for index in missing:
+        print('missing', json.dumps(index, sort_keys=True))
+    return 1 if missing else 0
+
+
+def _explain(args):
+    for description, plan in explain_queries(_connect(args), args.name):
+        print('{}: {}'.format(description, plan))
+        if 'COLLSCAN' in plan:
+            print('  warning: full collection scan')
+    return 0
+
+
+def _export(args):
+    from .export import export_couchdb, export_mongodb
+    if args.couchdb:
+        from .observers.couchdb import CouchDBReporter
+        reporter = CouchDBReporter(args.url, args.db or 'mlite_experiments')
+        reporter.connect()
+        paths = export_couchdb(reporter.db, args.directory, args.format,
+                               args.name, args.batch_size)
+    else:
+        paths = export_mongodb(_connect(args), args.directory, args.format,
+                               args.name, args.batch_size, args.overlap)
+    for path in paths:
+        print('exported', path)
+    return 0
+
+
+def _sweep_stale(args):
+    from .observers.mongodb import mark_dead_runs
+    print('marked', mark_dead_runs(_connect(args), args.timeout),
+          'runs as DIED')
+    if args.queue:
+        from .work_queue import MongoWorkQueue
+        queue = MongoWorkQueue(args.url, args.db or 'mlizard_experiments')
+        print('requeued', queue.requeue_stale(args.timeout), 'jobs')
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m mlite.dbtools',
+        description='Maintenance of the databases the reporters write to.')
+    parser.add_argument('--url', help='database url (default: localhost)')
+    parser.add_argument('--db', help='database name (default: '
+                                     'mlizard_experiments, mlite_experiments '
+                                     'for CouchDB)')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+    indexes = commands.add_parser(
+        'indexes', help='create and verify the indexes of the experiments '
+                        'collection')
+    indexes.add_argument('--option', action='append', default=[],
+                         help='also index runs by this (dotted) option key')
+    indexes.add_argument('--check', action='store_true',
+                         help='only report missing indexes')
+    indexes.set_defaults(func=_indexes)
+    explain = commands.add_parser(
+        'explain', help='show the query plans of the common queries')
+    explain.add_argument('--name', help='experiment name to query for')
+    explain.set_defaults(func=_explain)
+    export = commands.add_parser(
+        'export', help='export the runs finished since the last export to '
+                       'columnar files')
+    export.add_argument('directory', help='directory for the part files and '
+                                          'the export state')
+    export.add_argument('--format', default='npz',
+                        choices=['npz', 'hdf5', 'parquet'])
+    export.add_argument('--name', help='only export runs of this experiment')
+    export.add_argument('--batch-size', type=int, default=500,
+                        help='runs per part file (default: %(default)s)')
+    export.add_argument('--overlap', type=float, default=3600,
+                        help='seconds before the last exported stop_time to '
+                             'scan again for runs written late (default: '
+                             '%(default)s)')
+    export.add_argument('--couchdb', action='store_true',
+                        help='export from the CouchDBReporter database')
+    export.set_defaults(func=_export)
+    sweep_stale = commands.add_parser(
+        'sweep-stale', help='mark RUNNING runs whose heartbeat lapsed as DIED')
+    sweep_stale.add_argument('--timeout', type=float, default=300,
+                             help='seconds without heartbeat after which a '
+                                  'run is dead (default: %(default)s)')
+    sweep_stale.add_argument('--queue', action='store_true',
+                             help='also requeue claimed jobs of the work '
+                                  'queue whose worker stopped')
+    sweep_stale.set_defaults(func=_sweep_stale)
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
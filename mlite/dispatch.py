@@ -0,0 +1,167 @@
+#!/usr/bin/python
+# coding=utf-8
+from __future__ import division, print_function, unicode_literals
+from collections import deque
+from copy import deepcopy
+import inspect
+import os
+import threading
+from .utils import NO_LOGGER
+
+_accepted_arguments = dict()
+_STOP = object()  # queued by BackgroundDispatcher.close
+
+
+def notify_observers(observers, event, kwargs, tracer=None):
+    for o in observers:
+        # observers only implement the events they are interested in, but
+        # errors raised by the handlers are not hidden
+        handler = getattr(o, event, None)
+        if handler is None:
+            continue
+        if tracer is None:
+            handler(**accepted_kwargs(handler, kwargs))
+        else:
+            with tracer.span('{}.{}'.format(type(o).__name__, event),
+                             'observer'):
+                handler(**accepted_kwargs(handler, kwargs))
+
+
+def accepted_kwargs(handler, kwargs):
+    """
+    Return the kwargs the event handler accepts. Observers written for an
+    older version of the interface do not take the arguments added since
+    (like run_id, delta or fingerprint), so those are left out for them.
+    """
+    f = getattr(handler, '__func__', handler)
+    if not inspect.isfunction(f):  # e.g. a Mock, which accepts anything
+        return kwargs
+    if f not in _accepted_arguments:
+        if hasattr(inspect, 'getfullargspec'):
+            spec = inspect.getfullargspec(f)
+            accepted = spec.args + spec.kwonlyargs
+            kw_wildcard = spec.varkw
+        else:
+            accepted, _, kw_wildcard, _ = inspect.getargspec(f)
+        _accepted_arguments[f] = None if kw_wildcard else frozenset(accepted)
+    accepted = _accepted_arguments[f]
+    if accepted is None:
+        return kwargs
+    return {k: v for k, v in kwargs.items() if k in accepted}
+
+
+class SynchronousDispatcher(object):
+    """
+    Calls the observers directly from the thread that emits the event.
+    """
+    def __init__(self):
+        self.logger = NO_LOGGER
+        self.tracer = None
+
+    def emit(self, observers, event, kwargs):
+        notify_observers(observers, event, kwargs, self.tracer)
+
+    def flush(self):
+        pass
+
+    def close(self, timeout=None):
+        pass
+
+
+class BackgroundDispatcher(object):
+    """
+    Calls the observers from a dedicated thread such that emitting an event
+    never blocks on slow observers.
+
+    Events are put on a queue of at most maxsize entries. Consecutive events
+    of a type listed in coalesce only keep the latest one (with the deltas of
+    all of them merged), so the queue does not fill up with outdated info
+    updates. flush() blocks until all events
+    have been delivered. close() delivers the queued events and stops the
+    thread, which is started again by the next event. Exceptions raised by
+    observers are logged.
+    """
+    def __init__(self, maxsize=100, coalesce=('experiment_info_updated',)):
+        self.logger = NO_LOGGER
+        self.tracer = None
+        self.maxsize = maxsize
+        self.coalesce = coalesce
+        self._condition = threading.Condition()
+        self._events = deque()
+        self._pending = 0  # number of queued or currently delivered events
+        self._thread = None
+        self._pid = None
+
+    def emit(self, observers, event, kwargs):
+        # the emitting thread keeps modifying info (and the lists in it)
+        for key in ('info', 'delta'):
+            if kwargs.get(key) is not None:
+                kwargs = dict(kwargs, **{key: deepcopy(kwargs[key])})
+        with self._condition:
+            self._ensure_thread()
+            if (event in self.coalesce and len(self._events) > 0 and
+                    self._events[-1][1] == event):
+                queued_delta = self._events[-1][2].get('delta')
+                if (queued_delta is not None and
+                        kwargs.get('delta') is not None):
+                    queued_delta.update(kwargs['delta'])
+                    kwargs = dict(kwargs, delta=queued_delta)
+                self._events[-1] = (list(observers), event, kwargs)
+                return
+            while len(self._events) >= self.maxsize:
+                self._condition.wait()
+            self._events.append((list(observers), event, kwargs))
+            self._pending += 1
+            self._condition.notify_all()
+
+    def flush(self):
+        with self._condition:
+            while self._pending > 0:
+                self._condition.wait()
+
+    def close(self, timeout=60):
+        """
+        Deliver the queued events and stop the thread, waiting at most
+        timeout seconds for it.
+        """
+        with self._condition:
+            thread = self._thread
+            if thread is None or self._pid != os.getpid():
+                return
+            self._events.append((None, _STOP, None))
+            self._condition.notify_all()
+            self._thread = None
+        thread.join(timeout)
+        if thread.is_alive():
+            self.logger.warning("Observers did not finish within %s seconds.",
+                                timeout)
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        if self._pid != os.getpid():
+            # threads do not survive a fork so a forked child needs its own
+            self._events.clear()
+            self._pending = 0
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._deliver_events,
+                                        name='mlite-observer-dispatch')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _deliver_events(self):
+        while True:
+            with self._condition:
+                while len(self._events) == 0:
+                    self._condition.wait()
+                observers, event, kwargs = self._events.popleft()
+                self._condition.notify_all()
+            if event is _STOP:
+                return
+            try:
+                notify_observers(observers, event, kwargs, self.tracer)
+            except Exception:
+                self.logger.exception("Observer failed to handle %s.", event)
+            with self._condition:
+                self._pending -= 1
+                self._condition.notify_all()
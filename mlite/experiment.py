@@ -5,33 +5,73 @@ from copy import deepcopy
 from datetime import timedelta
 import inspect
 import os
+import shutil
 import time
+import uuid
 from numpy.random import RandomState
-from mlite.plots import LivePlot
-from .stage import StageFunction
-from .utils import generate_seed, create_basic_stream_logger
+from .cache import StageCache
+from .dispatch import BackgroundDispatcher, SynchronousDispatcher
+from .info import InfoDict
+from .metrics import ScalarLog
+from .stage import StageFunction, StageMetrics
+from .utils import (generate_seed, create_basic_stream_logger,
+                    fingerprint, import_generator_api)
 
 
 class Experiment(object):
     CONSTRUCTING, WAITING, RUNNING, COMPLETED, INTERRUPTED, FAILED = range(6)
 
     def __init__(self, name=None, seed=None, options=None, observers=(),
-                 logger=None):
+                 logger=None, cache=None, async_observers=False,
+                 rng='legacy', tracer=None, info_update_interval=None,
+                 resume_dir=None, reuse_results=False):
+        self.cache = cache
+        self.resume_dir = resume_dir
+        self.reuse_results = reuse_results
+        self.rng = rng
+        self.tracer = tracer
+        self.info_update_interval = info_update_interval
         self.info = dict()
         self.logger = logger
         self.options = options if options is not None else dict()
         self.seed = seed
         self.__doc__ = None
         self.__name__ = name
+        self._fingerprint = None
         self._mainfile = None
+        self._mainfile_source = None
         self._main_stage = None
         self._observers = list(observers)
+        if async_observers:
+            self._dispatcher = BackgroundDispatcher()
+        else:
+            self._dispatcher = SynchronousDispatcher()
+        self._last_info_update = 0
+        self._metric_logs = dict()
+        self._run_id = None
         self._run_seed = None
         self._rnd = None
+        self._run_cache = None
         self._stages = []
         self._start_time = 0
         self._status = Experiment.CONSTRUCTING
 
+    @property
+    def info(self):
+        return self._info
+
+    @info.setter
+    def info(self, value):
+        self._info = InfoDict(value)
+        self._info.on_change = self._info_changed
+
+    def _info_changed(self):
+        if (self.info_update_interval is not None and
+                self._status == Experiment.RUNNING and
+                time.time() >= self._last_info_update +
+                self.info_update_interval):
+            self._emit_info_updated()
+
     ################### Observable interface ###################################
     def add_observer(self, obs):
         if not obs in self._observers:
@@ -41,79 +81,122 @@ class Experiment(object):
         if obs in self._observers:
             self._observers.remove(obs)
 
+    def _emit(self, event, **kwargs):
+        self._dispatcher.emit(self._observers, event, kwargs)
+
     def _emit_created(self):
-        for o in self._observers:
-            try:
-                o.experiment_created_event(name=self.__name__,
-                                           stages=self._stages,
-                                           seed=self.seed,
-                                           mainfile=self._mainfile,
-                                           doc=self.__doc__)
-            except AttributeError:
-                pass
+        self._emit('experiment_created_event',
+                   name=self.__name__,
+                   stages=self._stages,
+                   seed=self.seed,
+                   mainfile=self._mainfile,
+                   doc=self.__doc__)
 
     def _emit_started(self, args, kwargs):
         self.logger.info("Experiment started.")
         self._start_time = time.time()
-        for o in self._observers:
-            try:
-                o.experiment_started_event(start_time=self._start_time,
-                                           options=self.options,
-                                           run_seed=self._run_seed,
-                                           args=args,
-                                           kwargs=kwargs,
-                                           info=self.info)
-            except AttributeError:
-                pass
-                
+        self.info.pop_delta()
+        self._emit('experiment_started_event',
+                   start_time=self._start_time,
+                   options=self.options,
+                   run_seed=self._run_seed,
+                   args=args,
+                   kwargs=kwargs,
+                   info=self.info,
+                   run_id=self._run_id,
+                   fingerprint=self._fingerprint)
+
+    def _emit_metrics_updated(self):
+        metrics = dict()
+        for name, log in self._metric_logs.items():
+            export = log.pop_export()
+            if export is not None:
+                metrics[name] = export
+        if metrics:
+            self._emit('experiment_metrics_updated', metrics=metrics,
+                       run_id=self._run_id)
+
     def _emit_info_updated(self):
-        for o in self._observers:
-            try:
-                o.experiment_info_updated(info=self.info)
-            except AttributeError:
-                pass
+        self._last_info_update = time.time()
+        self._emit_metrics_updated()
+        self._emit('experiment_info_updated', info=self.info,
+                   delta=self.info.pop_delta(), run_id=self._run_id)
+
+    def _finalize_info(self):
+        for log in self._metric_logs.values():
+            log.close()
+        self._emit_metrics_updated()
+        self.info['stage_metrics'] = {
+            s.__name__: s.metrics.summary() for s in self._stages
+            if s.metrics.calls or s.metrics.cache_hits}
+        if self.tracer is not None:
+            self.info['trace'] = self.tracer.to_chrome_trace(
+                self.tracer.info_limit)
 
     def _emit_completed(self, result):
+        self._finalize_info()
         stop_time = time.time()
         elapsed_time = timedelta(seconds=round(stop_time - self._start_time))
         self.logger.info("Experiment completed. Took %s", elapsed_time)
-        for o in self._observers:
-            try:
-                o.experiment_completed_event(stop_time=stop_time,
-                                             result=result,
-                                             info=self.info)
-            except AttributeError:
-                pass
+        self._emit('experiment_completed_event',
+                   stop_time=stop_time,
+                   result=result,
+                   info=self.info,
+                   delta=self.info.pop_delta(),
+                   run_id=self._run_id)
+        self._dispatcher.close()
 
     def _emit_failed(self):
+        self._finalize_info()
         self.logger.warning("Experiment aborted!")
         fail_time = time.time()
-        for o in self._observers:
-            try:
-                o.experiment_failed_event(fail_time=fail_time,
-                                          info=self.info)
-            except AttributeError:
-                pass
+        self._emit('experiment_failed_event',
+                   fail_time=fail_time,
+                   info=self.info,
+                   delta=self.info.pop_delta(),
+                   run_id=self._run_id)
+        self._dispatcher.close()
 
     def _emit_interrupted(self):
+        self._finalize_info()
         self.logger.warning("Experiment aborted!")
         interrupt_time = time.time()
-        for o in self._observers:
-            try:
-                o.experiment_interrupted_event(interrupt_time=interrupt_time,
-                                               info=self.info)
-            except AttributeError:
-                pass
+        self._emit('experiment_interrupted_event',
+                   interrupt_time=interrupt_time,
+                   info=self.info,
+                   delta=self.info.pop_delta(),
+                   run_id=self._run_id)
+        self._dispatcher.close()
 
     ############################## Decorators ##################################
     def stage(self, f):
-        stage_func = StageFunction(f, default_options=self.options)
+        stage_func = StageFunction(f, default_options=self.options,
+                                   rng=self.rng)
         self._stages.append(stage_func)
         return stage_func
 
+    def cached_stage(self, f):
+        stage_func = self.stage(f)
+        stage_func.cache = self.cache
+        return stage_func
+
+    def resumable_stage(self, f):
+        """
+        Stage whose results are stored in resume_dir, so a run that is
+        started again after an interruption does not repeat its calls.
+        """
+        stage_func = self.stage(f)
+        stage_func.resumable = True
+        return stage_func
+
     def main(self, f):
         self._main_stage = self.stage(f)
         self._mainfile = inspect.getabsfile(f)
+        try:
+            with open(self._mainfile, 'rb') as mainfile:
+                self._mainfile_source = mainfile.read()
+        except IOError:  # e.g. defined interactively
+            self._mainfile_source = self._main_stage._source
         if self.__name__ is None:
             self.__name__ = os.path.basename(self._mainfile).rsplit('.', 1)[0]
         self.__doc__ = inspect.getmodule(f).__doc__
@@ -135,17 +218,49 @@ class Experiment(object):
     def live_plot(self, f):
         if not inspect.isgeneratorfunction(f):
             raise TypeError("Live plots must be generator functions!")
+        from .plots import LivePlot
         lp = LivePlot(f)
         self.add_observer(lp)
         return lp
 
     ######################## Experiment public Interface #######################
     def run(self, *args, **kwargs):
+        """
+        Run the experiment. If reuse_results is set and an observer has stored
+        a completed run with the same mainfile, options, seed and arguments,
+        its result is returned instead.
+        """
+        return self._run(args, kwargs, self.reuse_results)
+
+    def rerun(self, *args, **kwargs):
+        """
+        Run the experiment even if reuse_results is set.
+        """
+        return self._run(args, kwargs, False)
+
+    def _run(self, args, kwargs, reuse_results):
         self._initialize()
+        # identifies the run for reusing its result and for resuming it
+        self._fingerprint = fingerprint(self.__name__, self._mainfile_source,
+                                        self.options, self._run_seed,
+                                        list(args), kwargs)
+        if reuse_results and self._fingerprint is not None:
+            for obs in self._observers:
+                lookup = getattr(obs, 'lookup_result', None)
+                if lookup is None:
+                    continue
+                found, result = lookup(self._fingerprint)
+                if found:
+                    self.logger.info("Reusing the stored result of a "
+                                     "completed run.")
+                    self._status = Experiment.COMPLETED
+                    return result
+        self._set_up_resume()
         self._emit_started(args, kwargs)
         try:
             result = self._main_stage(*args, **kwargs)
             self._status = Experiment.COMPLETED
+            self._clean_up_resume()
             self._emit_completed(result)
             return result
         except KeyboardInterrupt:
@@ -160,6 +275,15 @@ class Experiment(object):
     def _initialize(self):
         self.set_up_logging()
         self._reseed()
+        if self.tracer is not None:
+            self.tracer.clear()
+        self._dispatcher.tracer = self.tracer
+        for s in self._stages:
+            s.metrics = StageMetrics()
+            s.tracer = self.tracer
+        for log in self._metric_logs.values():
+            log.clear()
+        self._run_id = uuid.uuid4().hex
         self._status = Experiment.RUNNING
 
     def _reseed(self):
@@ -173,24 +297,104 @@ class Experiment(object):
                                     self._run_seed)
         else:
             self._run_seed = self.seed
-        self._rnd = RandomState(self._run_seed)
-
-        for s in self._stages:
-            s.seed = generate_seed(self._rnd)
+        if self.rng == 'pcg64':
+            seed_sequence_cls = import_generator_api()[2]
+            stage_seeds = seed_sequence_cls(self._run_seed).spawn(
+                len(self._stages))
+            for s, stage_seed in zip(self._stages, stage_seeds):
+                s.seed = stage_seed
+        else:
+            self._rnd = RandomState(self._run_seed)
+            for s in self._stages:
+                s.seed = generate_seed(self._rnd)
 
     def set_up_logging(self):
         if self.logger is None:
             self.logger = create_basic_stream_logger(self.__name__)
             self.logger.debug("No logger given. Created basic stream logger.")
+        self._dispatcher.logger = self.logger
         for s in self._stages:
             s.logger = self.logger.getChild(s.__name__)
 
+    def _set_up_resume(self):
+        self._run_cache = None
+        if self.resume_dir is not None:
+            if self._fingerprint is None:
+                self.logger.warning("Options or arguments cannot be pickled. "
+                                    "This run cannot be resumed.")
+            else:
+                self._run_cache = StageCache(
+                    os.path.join(self.resume_dir, self._fingerprint),
+                    mmap_mode=None)
+                self.logger.info("Storing stage results and checkpoints in "
+                                 "%s.", self._run_cache.directory)
+        for s in self._stages:
+            s.run_cache = self._run_cache if s.resumable else None
+
+    def _clean_up_resume(self):
+        # a completed run is not resumed, so its stored results are obsolete
+        if self._run_cache is not None:
+            shutil.rmtree(self._run_cache.directory, ignore_errors=True)
+            self._run_cache = None
+
+    ############################### Resuming ###################################
+    def save_checkpoint(self, name, value):
+        """
+        Store value under name so an interrupted run can continue from it when
+        it is started again. Does nothing unless resume_dir is set. The
+        checkpoints and the results of resumable stages are removed when the
+        run completes.
+        """
+        if self._run_cache is not None:
+            self._run_cache.put(fingerprint('checkpoint', name), value)
+
+    def load_checkpoint(self, name, default=None):
+        """
+        Return the value last stored with save_checkpoint(name) by this or an
+        earlier run with the same options, seed and arguments.
+        """
+        if self._run_cache is not None:
+            found, value = self._run_cache.get(fingerprint('checkpoint', name))
+            if found:
+                return value
+        return default
+
+    ############################### Metrics ####################################
+    def metric(self, name, retention=None, size=None):
+        """
+        Return the ScalarLog of the metric name. Passing a retention (and
+        size) configures how many of its values are kept, see ScalarLog.
+        """
+        if name not in self._metric_logs or retention is not None:
+            self._metric_logs[name] = ScalarLog(retention, size)
+        return self._metric_logs[name]
+
+    def log_scalar(self, name, value, step=None):
+        """
+        Log the value of metric name at step (default: the last step + 1).
+        New values are sent to the observers with the next info update.
+        """
+        self.metric(name).append(value, step)
+        self._info_changed()
+
     ################################## Optionsets ##############################
     def optionset(self, section_name):
         options = deepcopy(self.options)
         options.update(self.options[section_name])
         return OptionContext(options, self._stages)
 
+    def sweep(self, overrides, processes=None, observers=None):
+        from .sweep import run_sweep
+        return run_sweep(self, overrides, processes, observers)
+
+    def enqueue(self, queue, overrides, priority=0):
+        from .work_queue import enqueue
+        return enqueue(self, queue, overrides, priority)
+
+    def work(self, queue, **kwargs):
+        from .work_queue import run_worker
+        return run_worker(self, queue, **kwargs)
+
 
 class StageFunctionOptionsView(object):
     def __init__(self, stage_func, options):
@@ -0,0 +1,234 @@
+#!/usr/bin/python
+# coding=utf-8
+from __future__ import division, print_function, unicode_literals
+import json
+import numbers
+import os
+import numpy as np
+from .query import to_columns
+
+FORMATS = {'npz': 'npz', 'hdf5': 'h5', 'parquet': 'parquet'}
+STATE_FILE = 'export_state.json'
+
+
+def export_mongodb(collection, directory, format='npz', name=None,
+                   batch_size=500, overlap=3600):
+    """
+    Export the finished runs from the collection the MongoDBReporter writes
+    to that were not exported to directory before. Every batch_size runs are
+    written to a new part file (see write_part). Returns their paths.
+
+    Runs are found by their stop_time, which the reporting machines set
+    with their own clocks, so a run can be written after runs that stopped
+    later. Therefore the runs that stopped up to overlap seconds before the
+    last exported one are scanned again, skipping those already exported.
+    """
+    _check_format(format)
+    state = _load_state(directory)
+    query = {'stop_time': {'$exists': True}}
+    if 'stop_time' in state:
+        query['stop_time'] = {'$gte': state['stop_time'] - overlap}
+    if name is not None:
+        query['name'] = name
+    cursor = collection.find(query).sort('stop_time', 1)
+    cursor = cursor.batch_size(batch_size)
+    exported = state.get('exported', {})
+    paths = []
+    runs = []
+    for run in cursor:
+        if '{}'.format(run['_id']) in exported:
+            continue
+        runs.append(run)
+        if len(runs) == batch_size:
+            paths.append(_export_mongodb_part(directory, state, runs, format,
+                                              overlap))
+            runs = []
+    if runs:
+        paths.append(_export_mongodb_part(directory, state, runs, format,
+                                          overlap))
+    return paths
+
+
+def export_couchdb(db, directory, format='npz', name=None, batch_size=500):
+    """
+    Export the finished runs from the database the CouchDBReporter writes
+    to that changed since the last export to directory, using the _changes
+    feed. A run that changes again after it was exported is exported again,
+    so the later part files contain the newer version. Returns the paths of
+    the written part files.
+    """
+    _check_format(format)
+    state = _load_state(directory)
+    paths = []
+    while True:
+        changes = db.changes(since=state.get('couchdb_seq', 0),
+                             include_docs=True, limit=batch_size)
+        if not changes['results']:
+            return paths
+        runs = [dict(c['doc']) for c in changes['results']
+                if not c.get('deleted') and 'stop_time' in c.get('doc', {})
+                and (name is None or c['doc'].get('name') == name)]
+        for run in runs:
+            run.pop('_rev', None)
+        if runs:
+            paths.append(_export_part(directory, state, runs, format,
+                                      couchdb_seq=changes['last_seq']))
+        else:
+            state['couchdb_seq'] = changes['last_seq']
+            _save_state(directory, state)
+
+
+def write_part(path, runs, format='npz'):
+    """
+    Write the runs (documents as stored by the reporters) to path as columns
+    (see query.to_columns):
+      * 'npz': one compressed array per column. Columns that are not
+        numeric are object arrays, so load them with allow_pickle=True.
+      * 'hdf5': one dataset per column. Columns that contain arrays (like
+        those in info) are groups with one chunked, compressed dataset per
+        run named by its row. Other non-numeric columns are stored as
+        strings, JSON encoded unless they only contain strings.
+      * 'parquet': a compressed table with list columns for arrays.
+    """
+    _check_format(format)
+    columns = {key: _plain(column)
+               for key, column in to_columns(runs).items()}
+    tmp_path = path + '.tmp'
+    if format == 'npz':
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, **columns)
+    elif format == 'hdf5':
+        _write_hdf5(tmp_path, columns)
+    else:
+        _write_parquet(tmp_path, columns)
+    os.rename(tmp_path, path)
+
+
+def _check_format(format):
+    if format not in FORMATS:
+        raise ValueError("Unknown format '{}'. Use one of {}".format(
+            format, sorted(FORMATS)))
+
+
+def _export_part(directory, state, runs, format, **progress):
+    part = state.get('parts', 0)
+    path = os.path.join(directory,
+                        'runs-{:06d}.{}'.format(part, FORMATS[format]))
+    write_part(path, runs, format)
+    state['parts'] = part + 1
+    state.update(progress)
+    _save_state(directory, state)
+    return path
+
+
+def _export_mongodb_part(directory, state, runs, format, overlap):
+    # remember the ids of the runs within the overlap window
+    stop_time = max([state.get('stop_time', float('-inf'))] +
+                    [run['stop_time'] for run in runs])
+    exported = {i: t for i, t in state.get('exported', {}).items()
+                if t >= stop_time - overlap}
+    exported.update(('{}'.format(run['_id']), run['stop_time'])
+                    for run in runs if run['stop_time'] >= stop_time - overlap)
+    return _export_part(directory, state, runs, format, stop_time=stop_time,
+                        exported=exported)
+
+
+def _load_state(directory):
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    path = os.path.join(directory, STATE_FILE)
+    if not os.path.exists(path):
+        return dict()
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_state(directory, state):
+    path = os.path.join(directory, STATE_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f)
+    os.rename(path + '.tmp', path)
+
+
+def _plain(column):
+    # values other than numbers, strings and arrays (e.g. ObjectIds) become
+    # strings and lazily loaded arrays are fetched
+    if column.dtype != object:
+        return column
+    plain = np.empty(len(column), dtype=object)
+    for i, v in enumerate(column):
+        if isinstance(v, (np.ndarray, numbers.Number, type(''), bytes,
+                          type(None))):
+            plain[i] = v
+        elif hasattr(v, '__array__'):
+            plain[i] = np.asarray(v)
+        else:
+            plain[i] = '{}'.format(v)
+    return plain
+
+
+def _is_text(v):
+    return isinstance(v, (type(''), bytes))
+
+
+def _to_json(v):
+    return json.dumps(v.tolist() if isinstance(v, np.ndarray) else v)
+
+
+def _write_hdf5(path, columns):
+    try:
+        import h5py
+    except ImportError:
+        raise ImportError('Exporting to HDF5 depends on the h5py package. '
+                          'Run "pip install h5py" to install it.')
+    text = h5py.special_dtype(vlen=type(''))
+    with h5py.File(path, 'w') as f:
+        for key, column in columns.items():
+            key = key.replace('/', '|')
+            if column.dtype != object:
+                f.create_dataset(key, data=column, chunks=True,
+                                 compression='gzip')
+            elif any(isinstance(v, np.ndarray) and v.dtype.kind in 'biuf'
+                     for v in column):
+                group = f.create_group(key)
+                for row, v in enumerate(column):
+                    if v is None:
+                        continue
+                    v = np.asarray(v)
+                    if v.ndim > 0 and v.dtype.kind in 'biuf':
+                        group.create_dataset('{}'.format(row), data=v,
+                                             chunks=True, compression='gzip')
+                    else:
+                        group.create_dataset('{}'.format(row),
+                                             data=_to_json(v), dtype=text)
+            elif all(v is None or _is_text(v) for v in column):
+                f.create_dataset(key, data=['' if v is None else v
+                                            for v in column], dtype=text)
+            else:
+                f.create_dataset(key, data=[_to_json(v) for v in column],
+                                 dtype=text)
+
+
+def _write_parquet(path, columns):
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError('Exporting to Parquet depends on the pyarrow '
+                          'package. Run "pip install pyarrow" to install it.')
+    names = sorted(columns)
+    arrays = []
+    for key in names:
+        column = columns[key]
+        if column.dtype != object:
+            arrays.append(pyarrow.array(column))
+            continue
+        values = [v.tolist() if isinstance(v, np.ndarray) else v
+                  for v in column]
+        try:
+            arrays.append(pyarrow.array(values))
+        except (pyarrow.lib.ArrowException, TypeError):  # mixed types
+            arrays.append(pyarrow.array([None if v is None else _to_json(v)
+                                         for v in column]))
+    table = pyarrow.Table.from_arrays(arrays, names)
+    pyarrow.parquet.write_table(table, path, compression='zstd')
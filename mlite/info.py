@@ -0,0 +1,222 @@
+#!/usr/bin/python
+# coding=utf-8
+from __future__ import division, print_function, unicode_literals
+from copy import deepcopy
+
+
+class InfoDelta(object):
+    """
+    The changes to an InfoDict between two events: changed maps keys to their
+    new values, appended maps keys of lists to the items appended to them and
+    removed is the set of deleted keys.
+
+    Observers that do not store every event can merge the deltas they skip
+    with update().
+    """
+    def __init__(self, changed=None, appended=None, removed=None):
+        self.changed = changed if changed is not None else dict()
+        self.appended = appended if appended is not None else dict()
+        self.removed = removed if removed is not None else set()
+
+    def update(self, other):
+        for key, value in other.changed.items():
+            self.changed[key] = value
+            self.appended.pop(key, None)
+            self.removed.discard(key)
+        for key, items in other.appended.items():
+            if key in self.changed:  # changed values are copies
+                if isinstance(self.changed[key], list):
+                    self.changed[key] = self.changed[key] + list(items)
+            else:
+                self.appended.setdefault(key, []).extend(items)
+        for key in other.removed:
+            self.changed.pop(key, None)
+            self.appended.pop(key, None)
+            self.removed.add(key)
+
+    def __bool__(self):
+        return bool(self.changed or self.appended or self.removed)
+
+    __nonzero__ = __bool__
+
+    def __repr__(self):
+        return 'InfoDelta(changed={!r}, appended={!r}, removed={!r})'.format(
+            self.changed, self.appended, self.removed)
+
+
+class InfoDict(dict):
+    """
+    A dict that keeps track of the keys that were set, removed or had items
+    appended since the last call to pop_delta().
+
+    Lists stored in it are copied into a TrackedList, so appending to them is
+    reported as such instead of as a changed value. Items appended to the
+    original list are picked up as well, whenever the key is read and with
+    every delta (other modifications of the original list are not).
+    Modifications inside other values (like arrays or nested dicts) are not
+    noticed; assign the value again or call mark_changed(key) for those. If
+    on_change is set it is called after every tracked modification.
+    """
+    def __init__(self, *args, **kwargs):
+        super(InfoDict, self).__init__()
+        self.on_change = None
+        self._changed = set()
+        self._appended = dict()  # key -> length of the list at the last delta
+        self._removed = set()
+        self._sources = dict()  # key -> (assigned list, length picked up)
+        self.update(*args, **kwargs)
+
+    def __getitem__(self, key):
+        if key in self._sources:
+            self._pick_up_appends(key)
+        return super(InfoDict, self).__getitem__(key)
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def __setitem__(self, key, value):
+        if (isinstance(value, TrackedList) and
+                value is super(InfoDict, self).get(key)):
+            return  # info[key] += items already reported the append
+        self._detach(key)
+        if isinstance(value, list):
+            if not isinstance(value, TrackedList):
+                self._sources[key] = (value, len(value))
+            value = TrackedList(value)
+            value._owner = (self, key)
+        super(InfoDict, self).__setitem__(key, value)
+        self.mark_changed(key)
+
+    def __delitem__(self, key):
+        self._detach(key)
+        super(InfoDict, self).__delitem__(key)
+        self._changed.discard(key)
+        self._appended.pop(key, None)
+        self._removed.add(key)
+        self._notify()
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key, *default):
+        if key not in self:
+            return super(InfoDict, self).pop(key, *default)
+        value = self[key]
+        del self[key]
+        return value
+
+    def popitem(self):
+        if not self:
+            raise KeyError('popitem(): dictionary is empty')
+        key = next(iter(self))
+        return key, self.pop(key)
+
+    def clear(self):
+        for key in list(self.keys()):
+            del self[key]
+
+    def mark_changed(self, key):
+        self._changed.add(key)
+        self._appended.pop(key, None)
+        self._removed.discard(key)
+        self._notify()
+
+    def pop_delta(self):
+        """
+        Return an InfoDelta of all modifications since the last call. It
+        contains copies of the values, so later modifications do not change
+        it.
+        """
+        for key in list(self._sources):
+            self._pick_up_appends(key)
+        delta = InfoDelta({k: deepcopy(self[k]) for k in self._changed},
+                          {k: list(self[k][start:])
+                           for k, start in self._appended.items()},
+                          self._removed)
+        self._changed = set()
+        self._appended = dict()
+        self._removed = set()
+        return delta
+
+    def _list_appended(self, key, old_length):
+        if key not in self._changed:
+            self._appended.setdefault(key, old_length)
+        self._notify()
+
+    def _pick_up_appends(self, key):
+        source, length = self._sources[key]
+        if len(source) > length:
+            self._sources[key] = (source, len(source))
+            super(InfoDict, self).__getitem__(key).extend(source[length:])
+
+    def _detach(self, key):
+        self._sources.pop(key, None)
+        old = super(InfoDict, self).get(key)
+        if isinstance(old, TrackedList):
+            old._owner = None
+
+    def _notify(self):
+        if self.on_change is not None:
+            self.on_change()
+
+    def __reduce__(self):  # copies and pickles are plain dicts
+        return dict, ({key: self[key] for key in self},)
+
+
+class TrackedList(list):
+    """
+    A list that reports appends and other modifications to the InfoDict it is
+    stored in.
+    """
+    _owner = None
+
+    def append(self, item):
+        old_length = len(self)
+        super(TrackedList, self).append(item)
+        self._appended(old_length)
+
+    def extend(self, items):
+        old_length = len(self)
+        super(TrackedList, self).extend(items)
+        self._appended(old_length)
+
+    def __iadd__(self, items):
+        self.extend(items)
+        return self
+
+    def _appended(self, old_length):
+        if self._owner is not None:
+            info, key = self._owner
+            info._list_appended(key, old_length)
+
+    def _modified(self):
+        if self._owner is not None:
+            info, key = self._owner
+            info.mark_changed(key)
+
+    def __reduce__(self):
+        return list, (list(self),)
+
+
+def _modifies_list(name):
+    method = getattr(list, name)
+
+    def modify(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        self._modified()
+        return self if name == '__imul__' else result
+    modify.__name__ = str(name)
+    return modify
+
+
+for _name in ('__setitem__', '__delitem__', '__setslice__', '__delslice__',
+              '__imul__', 'insert', 'pop', 'remove', 'reverse', 'sort'):
+    if hasattr(list, _name):
+        setattr(TrackedList, _name, _modifies_list(_name))
+del _name
@@ -0,0 +1,209 @@
+#!/usr/bin/python
+# coding=utf-8
+from __future__ import division, print_function, unicode_literals
+import random
+import numpy as np
+
+RETENTIONS = (None, 'last', 'reservoir', 'minmax')
+
+
+class ScalarLog(object):
+    """
+    Stores the (step, value) pairs of a scalar metric in numpy buffers.
+
+    By default all values are kept and the buffers grow as needed. Otherwise
+    at most size values are retained according to retention:
+      * 'last': only the last size values
+      * 'reservoir': a uniform random sample of all values
+      * 'minmax': downsampled history that keeps the minimum and maximum of
+        every block of steps. Blocks double in length whenever the buffer is
+        full, so the whole history stays covered with uniform resolution.
+
+    min and max are the (step, value) pairs of the smallest and largest value
+    logged so far, independent of the retention.
+
+    pop_export() returns the retained values that are new since the last
+    export, or all of them if older ones were replaced or dropped.
+    """
+    def __init__(self, retention=None, size=None):
+        if retention not in RETENTIONS:
+            raise ValueError("Unknown retention '{}'. Use one of {}".format(
+                retention, RETENTIONS))
+        if retention is not None and (size is None or size < 4):
+            raise ValueError('Retention {} needs a size of at least 4.'
+                             .format(retention))
+        self.retention = retention
+        self.size = size if retention != 'minmax' else size - size % 4
+        self.clear()
+
+    def clear(self):
+        capacity = self.size if self.retention is not None else 64
+        self._steps = np.zeros(capacity, dtype=np.int64)
+        self._values = np.zeros(capacity, dtype=np.float64)
+        self._len = 0
+        self._exported = 0
+        self._rewritten = False
+        self._rnd = random.Random(0)
+        self._block = []  # the unfinished block of 'minmax'
+        self._block_size = 2
+        self.count = 0
+        self.last_step = -1
+        self.min = None
+        self.max = None
+
+    def append(self, value, step=None):
+        step = self.last_step + 1 if step is None else int(step)
+        self.count += 1
+        self.last_step = step
+        if value == value:  # ignore NaN
+            if self.min is None or value < self.min[1]:
+                self.min = (step, value)
+            if self.max is None or value > self.max[1]:
+                self.max = (step, value)
+        if self.retention is None:
+            if self._len == len(self._values):
+                self._grow()
+            self._put(self._len, step, value)
+        elif self.retention == 'last':
+            if self.count > self.size:
+                self._rewritten = True
+            self._put((self.count - 1) % self.size, step, value)
+        elif self.retention == 'reservoir':
+            if self.count <= self.size:
+                self._put(self.count - 1, step, value)
+            else:
+                i = self._rnd.randint(0, self.count - 1)
+                if i < self.size:
+                    self._put(i, step, value)
+                    self._rewritten = True
+        else:
+            self._block.append((step, value))
+            if len(self._block) == self._block_size:
+                self._store_block()
+
+    def close(self):
+        """
+        Store the unfinished block of a 'minmax' log.
+        """
+        if self._block:
+            self._store_block()
+
+    @property
+    def steps(self):
+        return self._retained()[0]
+
+    @property
+    def values(self):
+        return self._retained()[1]
+
+    def __len__(self):
+        return self._len
+
+    def pop_export(self):
+        """
+        Return a dict with the lists steps and values of the retained points
+        not exported yet and whether they replace all earlier ones. Returns
+        None if nothing changed.
+        """
+        if not self._rewritten and self._exported == self._len:
+            return None
+        steps, values = self._retained()
+        replace = self._rewritten
+        if not replace:
+            steps = steps[self._exported:]
+            values = values[self._exported:]
+        self._exported = self._len
+        self._rewritten = False
+        return {'steps': steps.tolist(),
+                'values': values.tolist(),
+                'replace': replace}
+
+    def _put(self, i, step, value):
+        self._steps[i] = step
+        self._values[i] = value
+        self._len = max(self._len, i + 1)
+
+    def _grow(self):
+        self._steps = np.resize(self._steps, 2 * len(self._steps))
+        self._values = np.resize(self._values, 2 * len(self._values))
+
+    def _store_block(self):
+        if self._len + 2 > self.size:
+            self._compact()
+        for step, value in _min_max(self._block):
+            self._put(self._len, step, value)
+        self._block = []
+
+    def _compact(self):
+        # merge every two min/max pairs into one, a shorter block (stored
+        # by close) at the end is kept as is
+        n = self._len - self._len % 4
+        steps = self._steps[:n].reshape(-1, 4)
+        values = self._values[:n].reshape(-1, 4)
+        rows = np.arange(len(values))
+        lo = np.argmin(values, axis=1)
+        hi = np.argmax(values, axis=1)
+        hi = np.where(lo == hi, np.where(lo == 3, 0, 3), hi)
+        first = np.minimum(lo, hi)
+        second = np.maximum(lo, hi)
+        for buf, grouped in [(self._steps, steps), (self._values, values)]:
+            merged = np.empty(n // 2, dtype=buf.dtype)
+            merged[0::2] = grouped[rows, first]
+            merged[1::2] = grouped[rows, second]
+            rest = buf[n:self._len].copy()
+            buf[:n // 2] = merged
+            buf[n // 2:n // 2 + len(rest)] = rest
+        self._len = n // 2 + self._len - n
+        self._block_size *= 2
+        self._rewritten = True
+
+    def _retained(self):
+        steps = self._steps[:self._len]
+        values = self._values[:self._len]
+        if self.retention == 'last' and self.count > self.size:
+            start = self.count % self.size
+            steps = np.roll(steps, -start)
+            values = np.roll(values, -start)
+        elif self.retention == 'reservoir' and self.count > self.size:
+            order = np.argsort(steps, kind='mergesort')
+            steps = steps[order]
+            values = values[order]
+        return steps, values
+
+
+def _min_max(block):
+    # the points with the smallest and largest value in the order of steps
+    indices = range(len(block))
+    lo = min(indices, key=lambda i: block[i][1])
+    hi = max(indices, key=lambda i: block[i][1])
+    if lo == hi:
+        hi = len(block) - 1 if lo == 0 else 0
+    return [block[i] for i in sorted({lo, hi})]
+
+
+def apply_metrics(stored, metrics):
+    """
+    Apply the exported metrics (as passed to experiment_metrics_updated) to
+    stored, a dict mapping metric names to dicts with the lists steps and
+    values.
+    """
+    for name, update in metrics.items():
+        if update['replace'] or name not in stored:
+            stored[name] = {'steps': [], 'values': []}
+        stored[name]['steps'].extend(update['steps'])
+        stored[name]['values'].extend(update['values'])
+
+
+def merge_metrics(pending, metrics):
+    """
+    Merge the exported metrics (as passed to experiment_metrics_updated) into
+    the dict pending, so they can be stored at once.
+    """
+    for name, update in metrics.items():
+        if update['replace'] or name not in pending:
+            pending[name] = {'steps': list(update['steps']),
+                             'values': list(update['values']),
+                             'replace': update['replace']}
+        else:
+            pending[name]['steps'].extend(update['steps'])
+            pending[name]['values'].extend(update['values'])
@@ -1,4 +1,5 @@
 #!/usr/bin/python
 # coding=utf-8
 from __future__ import division, print_function, unicode_literals
-from .base_observer import ExperimentObserver
\ No newline at end of file
+from .base_observer import ExperimentObserver
+from .file_storage import FileStorageObserver, load_run
\ No newline at end of file
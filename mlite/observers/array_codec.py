@@ -0,0 +1,63 @@
+#!/usr/bin/python
+# coding=utf-8
+from __future__ import division, print_function, unicode_literals
+import zlib
+import numpy as np
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+COMPRESSIONS = (None, 'zlib', 'lz4')
+
+
+def encode_ndarray(array, compression=None):
+    """
+    Encode a numpy array as a tuple (header, data) where data is the raw
+    contiguous buffer of the array (optionally compressed with 'zlib' or
+    'lz4') and header is a dict with dtype, shape and compression.
+
+    Arrays that have no plain memory layout (object and structured dtypes)
+    are pickled instead and get an empty header.
+    """
+    if compression not in COMPRESSIONS:
+        raise ValueError("Unknown compression '{}'. Use one of {}".format(
+            compression, COMPRESSIONS))
+    if array.dtype.hasobject or array.dtype.fields is not None:
+        return dict(), pickle.dumps(array, protocol=2)
+    data = array.tobytes()  # always in C order
+    if compression == 'zlib':
+        data = zlib.compress(data)
+    elif compression == 'lz4':
+        data = _import_lz4().compress(data)
+    header = {'dtype': array.dtype.str,
+              'shape': list(array.shape),
+              'compression': compression}
+    return header, data
+
+
+def decode_ndarray(header, data):
+    """
+    Decode an array from the header and data as returned by encode_ndarray.
+    Uncompressed data is used without copying, so the resulting array is
+    read-only.
+    """
+    if 'dtype' not in header:
+        return pickle.loads(bytes(data))
+    compression = header.get('compression')
+    if compression == 'zlib':
+        data = zlib.decompress(data)
+    elif compression == 'lz4':
+        data = _import_lz4().decompress(data)
+    array = np.frombuffer(data, dtype=np.dtype(str(header['dtype'])))
+    return array.reshape(tuple(header['shape']))
+
+
+def _import_lz4():
+    try:
+        import lz4.block
+    except ImportError:
+        raise ImportError('lz4 compression depends on the lz4 package. '
+                          'Run "pip install lz4" to install it.')
+    return lz4.block
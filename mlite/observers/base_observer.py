@@ -8,17 +8,29 @@ class ExperimentObserver(object):
         pass
 
     def experiment_started_event(self, start_time, options, run_seed, args,
-                                 kwargs, info):
+                                 kwargs, info, run_id, fingerprint):
         pass
 
-    def experiment_info_updated(self, info):
+    def experiment_info_updated(self, info, delta, run_id):
         pass
 
-    def experiment_completed_event(self, stop_time, result, info):
+    def experiment_metrics_updated(self, metrics, run_id):
         pass
 
-    def experiment_interrupted_event(self, interrupt_time, info):
+    def experiment_completed_event(self, stop_time, result, info, delta,
+                                   run_id):
         pass
 
-    def experiment_failed_event(self, fail_time, info):
+    def experiment_interrupted_event(self, interrupt_time, info, delta,
+                                     run_id):
         pass
+
+    def experiment_failed_event(self, fail_time, info, delta, run_id):
+        pass
+
+    def lookup_result(self, fingerprint):
+        """
+        Return a tuple (found, result) with the result of a completed run with
+        the given fingerprint, if this observer stores results.
+        """
+        return False, None
@@ -1,37 +1,112 @@
 #!/usr/bin/python
 # coding=utf-8
-from __future__ import division, print_function, unicode_literals
+from __future__ import (division, print_function, unicode_literals,
+                        absolute_import)
 from copy import deepcopy
+import threading
 import time
 
 try:
     import couchdb
+    from couchdb.http import ResourceConflict
 except ImportError:
     raise ImportError('This Observer depends on the couchdb python '
                       'package. Run pip install CouchDB to install it.')
 
+from ..metrics import apply_metrics
 from .base_observer import ExperimentObserver
 
 
 class CouchDBReporter(ExperimentObserver):
+    """
+    Stores every run as a document with the run id as _id.
+
+    Documents are written through _bulk_docs. Info updates are written at most
+    every save_delay seconds and new runs are buffered until batch_size runs
+    have unsaved changes, so one reporter can be shared by many concurrent
+    runs. The end of a run always writes all buffered documents. Revisions are
+    tracked per run and conflicting writes are retried up to max_retries times
+    with the latest revision from the database.
+    """
     def __init__(self, url=None, db_name='mlite_experiments', credentials=None,
-                 save_delay=1):
+                 save_delay=1, batch_size=1, max_retries=3):
         super(CouchDBReporter, self).__init__()
         self.experiment_skeleton = dict()
-        self.experiment_entry = dict()
+        self.experiment_entries = dict()
+        self.revisions = dict()
         self.last_save = 0
         self.save_delay = save_delay
-        couch = couchdb.Server(url) if url else couchdb.Server()
-        if credentials is not None:
-            couch.resource.credentials = credentials
-        if db_name in couch:
-            self.db = couch[db_name]
-        else:
-            self.db = couch.create(db_name)
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self._unsaved = set()
+        self._lock = threading.RLock()
+        self.url = url
+        self.db_name = db_name
+        self.credentials = credentials
+        self.db = None
+
+    def connect(self):
+        """
+        Connect to the database and create it if necessary. This happens on
+        the first started event, so creating a reporter is cheap.
+        """
+        with self._lock:
+            if self.db is not None:
+                return
+            couch = couchdb.Server(self.url) if self.url else couchdb.Server()
+            if self.credentials is not None:
+                couch.resource.credentials = self.credentials
+            if self.db_name in couch:
+                self.db = couch[self.db_name]
+            else:
+                self.db = couch.create(self.db_name)
 
     def save(self):
-        self.last_save = time.time()
-        self.db.save(self.experiment_entry)
+        """
+        Write all buffered documents to the database.
+        """
+        with self._lock:
+            docs = []
+            for run_id in self._unsaved:
+                doc = dict(self.experiment_entries[run_id], _id=run_id)
+                if run_id in self.revisions:
+                    doc['_rev'] = self.revisions[run_id]
+                docs.append(doc)
+            self._unsaved.clear()
+            self.last_save = time.time()
+            for attempt in range(self.max_retries + 1):
+                conflicts = self._bulk_save(docs)
+                if not conflicts:
+                    return
+                docs = conflicts
+                for doc in docs:
+                    doc['_rev'] = self.db[doc['_id']]['_rev']
+            raise ResourceConflict('Could not save run(s) {}'.format(
+                [doc['_id'] for doc in docs]))
+
+    def _bulk_save(self, docs):
+        conflicts = []
+        for doc, (success, doc_id, rev) in zip(docs, self.db.update(docs)):
+            if success:
+                self.revisions[doc_id] = rev
+            elif isinstance(rev, ResourceConflict):
+                conflicts.append(doc)
+            else:
+                raise rev
+        return conflicts
+
+    def _update_entry(self, run_id, fields, finished=False):
+        with self._lock:
+            entry = self.experiment_entries[run_id]
+            entry.update(fields)
+            self._unsaved.add(run_id)
+            if finished:
+                self.save()
+                del self.experiment_entries[run_id]
+                self.revisions.pop(run_id, None)
+            elif (len(self._unsaved) >= self.batch_size or
+                    time.time() >= self.last_save + self.save_delay):
+                self.save()
 
     def experiment_created_event(self, name, stages, seed, mainfile, doc):
         self.experiment_skeleton['name'] = name
@@ -40,27 +115,50 @@ class CouchDBReporter(ExperimentObserver):
         self.experiment_skeleton['doc'] = doc
 
     def experiment_started_event(self, start_time, options, run_seed, args,
-                                 kwargs, info):
+                                 kwargs, info, run_id, fingerprint):
         # when an experiment starts, always make a new db entry
         # so we can rerun the same experiment and get multiple entries
-        self.experiment_entry = deepcopy(self.experiment_skeleton)
-
-        self.experiment_entry['start_time'] = start_time
-        self.experiment_entry['options'] = options
-        self.experiment_entry['seed'] = run_seed
-        self.experiment_entry['args'] = args
-        self.experiment_entry['kwargs'] = kwargs
-        self.experiment_entry['info'] = info
-        self.save()
-
-    def experiment_info_updated(self, info):
-        self.experiment_entry['info'] = info
-        if time.time() >= self.last_save + self.save_delay:
-            self.save()
-
-    def experiment_completed_event(self, stop_time, result, info):
-        self.experiment_entry['stop_time'] = stop_time
-        self.experiment_entry['result'] = result
-        self.experiment_entry['info'] = info
-        self.save()
+        self.connect()
+        with self._lock:
+            self.experiment_entries[run_id] = deepcopy(self.experiment_skeleton)
+            self._update_entry(run_id, {'start_time': start_time,
+                                        'options': options,
+                                        'seed': run_seed,
+                                        'args': args,
+                                        'kwargs': kwargs,
+                                        'fingerprint': fingerprint,
+                                        'info': info,
+                                        'status': 'RUNNING'})
+
+    def experiment_info_updated(self, info, delta, run_id):
+        if not delta:
+            return
+        with self._lock:
+            self.experiment_entries[run_id]['info'] = info
+            self._unsaved.add(run_id)
+            if time.time() >= self.last_save + self.save_delay:
+                self.save()
+
+    def experiment_metrics_updated(self, metrics, run_id):
+        with self._lock:
+            entry = self.experiment_entries[run_id]
+            apply_metrics(entry.setdefault('metrics', {}), metrics)
+            self._unsaved.add(run_id)
+
+    def experiment_completed_event(self, stop_time, result, info, delta,
+                                   run_id):
+        self._update_entry(run_id, {'stop_time': stop_time,
+                                    'result': result,
+                                    'info': info,
+                                    'status': 'COMPLETED'}, finished=True)
+
+    def experiment_interrupted_event(self, interrupt_time, info, delta,
+                                     run_id):
+        self._update_entry(run_id, {'stop_time': interrupt_time,
+                                    'info': info,
+                                    'status': 'INTERRUPTED'}, finished=True)
 
+    def experiment_failed_event(self, fail_time, info, delta, run_id):
+        self._update_entry(run_id, {'stop_time': fail_time,
+                                    'info': info,
+                                    'status': 'FAILED'}, finished=True)
@@ -0,0 +1,148 @@
+#!/usr/bin/python
+# coding=utf-8
+from __future__ import division, print_function, unicode_literals
+from copy import deepcopy
+import json
+import os
+import time
+import numpy as np
+
+from ..info import InfoDelta
+from ..metrics import apply_metrics
+from .base_observer import ExperimentObserver
+
+EVENTS_FILE = 'events.jsonl'
+
+
+class FileStorageObserver(ExperimentObserver):
+    """
+    Stores every run in a directory basedir/<run_id> as an append-only log of
+    JSON lines (events.jsonl). Numpy arrays are written to .npy files next to
+    it and only referenced from the log. Logged metrics are appended to the
+    log whenever the experiment exports them. Use load_run to read a run back
+    with memory-mapped arrays.
+
+    Info updates are written at most every save_delay seconds and only
+    contain the entries of info that changed since the last one.
+    """
+    def __init__(self, basedir, save_delay=0):
+        super(FileStorageObserver, self).__init__()
+        self.basedir = basedir
+        self.save_delay = save_delay
+        self.experiment_skeleton = dict()
+        self.runs = dict()
+
+    def experiment_created_event(self, name, stages, seed, mainfile, doc):
+        self.experiment_skeleton['name'] = name
+        self.experiment_skeleton['stages'] = [s.__name__ for s in stages]
+        self.experiment_skeleton['mainfile'] = mainfile
+        self.experiment_skeleton['doc'] = doc
+
+    def experiment_started_event(self, start_time, options, run_seed, args,
+                                 kwargs, info, run_id, fingerprint):
+        run_dir = os.path.join(self.basedir, run_id)
+        os.makedirs(run_dir)
+        self.runs[run_id] = _RunLog(run_dir)
+        event = deepcopy(self.experiment_skeleton)
+        event.update({'start_time': start_time,
+                      'options': options,
+                      'seed': run_seed,
+                      'args': args,
+                      'kwargs': kwargs,
+                      'fingerprint': fingerprint,
+                      'status': 'RUNNING'})
+        self.runs[run_id].append('started', event, InfoDelta(dict(info)))
+
+    def experiment_info_updated(self, info, delta, run_id):
+        run = self.runs[run_id]
+        if time.time() >= run.last_save + self.save_delay:
+            run.append('info_updated', {}, delta)
+        else:
+            run.unsaved_delta.update(delta)
+
+    def experiment_metrics_updated(self, metrics, run_id):
+        self.runs[run_id].append('metrics_updated', {'metrics': metrics},
+                                 InfoDelta())
+
+    def experiment_completed_event(self, stop_time, result, info, delta,
+                                   run_id):
+        self._finish(run_id, delta, {'stop_time': stop_time,
+                                     'result': result,
+                                     'status': 'COMPLETED'})
+
+    def experiment_interrupted_event(self, interrupt_time, info, delta,
+                                     run_id):
+        self._finish(run_id, delta, {'stop_time': interrupt_time,
+                                     'status': 'INTERRUPTED'})
+
+    def experiment_failed_event(self, fail_time, info, delta, run_id):
+        self._finish(run_id, delta, {'stop_time': fail_time,
+                                     'status': 'FAILED'})
+
+    def _finish(self, run_id, delta, fields):
+        run = self.runs.pop(run_id)
+        run.append(fields['status'].lower(), fields, delta)
+        run.close()
+
+
+class _RunLog(object):
+    def __init__(self, run_dir):
+        self.run_dir = run_dir
+        self.unsaved_delta = InfoDelta()
+        self.last_save = 0
+        self.nr_arrays = 0
+        self.file = open(os.path.join(run_dir, EVENTS_FILE), 'ab')
+
+    def append(self, event, fields, delta):
+        self.unsaved_delta.update(delta)
+        delta, self.unsaved_delta = self.unsaved_delta, InfoDelta()
+        fields = dict(fields, event=event)
+        if delta.changed:
+            fields['info_set'] = delta.changed
+        if delta.appended:
+            fields['info_append'] = delta.appended
+        if delta.removed:
+            fields['info_unset'] = sorted(delta.removed)
+        line = json.dumps(fields, default=self._encode, sort_keys=True)
+        self.file.write((line + '\n').encode('utf-8'))
+        self.file.flush()
+        self.last_save = time.time()
+
+    def close(self):
+        self.file.close()
+
+    def _encode(self, obj):
+        if isinstance(obj, np.ndarray):
+            filename = '{}.npy'.format(self.nr_arrays)
+            self.nr_arrays += 1
+            np.save(os.path.join(self.run_dir, filename), obj)
+            return {'_type': 'ndarray', 'file': filename}
+        if isinstance(obj, np.generic):
+            return obj.item()
+        raise TypeError('{!r} is not JSON serializable'.format(obj))
+
+
+def load_run(run_dir, mmap_mode='r'):
+    """
+    Read a run stored by FileStorageObserver and return it as a dict similar
+    to the MongoDB documents. Arrays are loaded using mmap_mode.
+    """
+    def decode(obj):
+        if obj.get('_type') == 'ndarray':
+            return np.load(os.path.join(run_dir, obj['file']),
+                           mmap_mode=mmap_mode)
+        return obj
+
+    run = {'info': dict(), 'metrics': dict()}
+    with open(os.path.join(run_dir, EVENTS_FILE), 'rb') as f:
+        for line in f:
+            event = json.loads(line.decode('utf-8'), object_hook=decode)
+            run['info'].update(event.pop('info_set', {}))
+            for key, values in event.pop('info_append', {}).items():
+                run['info'][key].extend(values)
+            for key in event.pop('info_unset', []):
+                del run['info'][key]
+            apply_metrics(run['metrics'], event.pop('metrics', {}))
+            del event['event']
+            run.update(event)
+    return run
@@ -2,27 +2,119 @@
 # coding=utf-8
 from __future__ import division, print_function, unicode_literals
 from copy import deepcopy
-import cPickle
+import hashlib
+import json
 import numpy as np
 import time
 
 try:
-    from pymongo import MongoClient
+    import gridfs
+    from pymongo import ASCENDING, DESCENDING, MongoClient, WriteConcern
     from pymongo.son_manipulator import SONManipulator
     from bson import Binary
 except ImportError:
     raise ImportError('This Observer depends on the pymongo package. '
                       'Run "pip install pymongo" to install it.')
 
+from .array_codec import decode_ndarray, encode_ndarray
+from ..info import InfoDelta
+from ..metrics import merge_metrics
+from ..utils import Heartbeat
 from .base_observer import ExperimentObserver
 
 
+# indexes for the common queries: runs of an experiment, running experiments,
+# runs with lapsed heartbeats and the lookup of stored results
+DEFAULT_INDEXES = (
+    {'keys': [('fingerprint', ASCENDING)]},
+    {'keys': [('name', ASCENDING), ('start_time', DESCENDING)]},
+    {'keys': [('name', ASCENDING), ('status', ASCENDING),
+              ('start_time', DESCENDING)]},
+    {'keys': [('start_time', DESCENDING)], 'name': 'running_start_time',
+     'partialFilterExpression': {'status': 'RUNNING'}},
+    {'keys': [('heartbeat', ASCENDING)], 'name': 'running_heartbeat',
+     'partialFilterExpression': {'status': 'RUNNING'}},
+)
+
+
+def option_index(key):
+    """
+    Return the specification of an index for the runs of an experiment by
+    the value of the (dotted) option key.
+    """
+    return {'keys': [('name', ASCENDING), ('options.' + key, ASCENDING)]}
+
+
+def ensure_indexes(collection, indexes=DEFAULT_INDEXES):
+    """
+    Create the given indexes unless they exist. Every index is a dict with
+    the list of (key, direction) pairs as keys and further arguments for
+    create_index like name or partialFilterExpression. Returns their names.
+    """
+    names = []
+    for index in indexes:
+        kwargs = dict(index)
+        keys = kwargs.pop('keys')
+        names.append(collection.create_index(keys, **kwargs))
+    return names
+
+
+def missing_indexes(collection, indexes=DEFAULT_INDEXES):
+    """
+    Return the given indexes for which the collection has no index with the
+    same keys and partial filter.
+    """
+    existing = [([(k, int(d)) for k, d in i['key']],
+                 i.get('partialFilterExpression'))
+                for i in collection.index_information().values()]
+    return [index for index in indexes
+            if (list(index['keys']),
+                index.get('partialFilterExpression')) not in existing]
+
+
+def mark_dead_runs(collection, timeout):
+    """
+    Set the status of RUNNING runs whose last heartbeat is older than timeout
+    seconds to DIED, with the current time as stop_time. Returns their
+    number. Runs stored without heartbeats are never marked.
+    """
+    now = time.time()
+    return collection.update_many(
+        {'status': 'RUNNING', 'heartbeat': {'$lt': now - timeout}},
+        {'$set': {'status': 'DIED', 'stop_time': now}}).modified_count
+
+
 class PickleNumpyArrays(SONManipulator):
+    """
+    Stores numpy arrays as their raw binary data (see encode_ndarray),
+    optionally compressed with 'zlib' or 'lz4'. Documents written by older
+    versions that contain pickled arrays can still be read.
+
+    If a GridFS instance fs is given, arrays larger than gridfs_threshold
+    bytes are stored there instead and only referenced from the document
+    (a gridfs_threshold of None never stores arrays in GridFS, fs is then
+    only used to read them). Those files are named by the hash of their
+    content, so every distinct array is uploaded only once. They are
+    fetched lazily using GridFSArray.
+    """
+    def __init__(self, fs=None, gridfs_threshold=0, compression=None):
+        self.fs = fs
+        self.gridfs_threshold = gridfs_threshold
+        self.compression = compression
+        self._stored_ids = set()
+
     def transform_incoming(self, son, collection):
         for (key, value) in son.items():
             if isinstance(value, np.ndarray):
-                son[key] = {"_type": "ndarray",
-                            "_value": Binary(cPickle.dumps(value, protocol=2))}
+                header, data = encode_ndarray(value, self.compression)
+                son[key] = dict(header, _type="ndarray")
+                if (self.fs is not None and
+                        self.gridfs_threshold is not None and
+                        value.nbytes > self.gridfs_threshold):
+                    son[key]["_gridfs_id"] = self._store_in_gridfs(header,
+                                                                   data)
+                else:
+                    son[key]["_value"] = Binary(data)
             elif isinstance(value, dict):  # Make sure we recurse into sub-docs
                 son[key] = self.transform_incoming(value, collection)
         return son
@@ -31,27 +123,164 @@ class PickleNumpyArrays(SONManipulator):
         for (key, value) in son.items():
             if isinstance(value, dict):
                 if "_type" in value and value["_type"] == "ndarray":
-                    son[key] = cPickle.loads(str(value["_value"]))
+                    if "_gridfs_id" in value:
+                        son[key] = GridFSArray(self.fs, value["_gridfs_id"],
+                                               value)
+                    else:
+                        son[key] = decode_ndarray(value, value["_value"])
                 else:  # Again, make sure to recurse into sub-docs
                     son[key] = self.transform_outgoing(value, collection)
         return son
 
+    def _store_in_gridfs(self, header, data):
+        h = hashlib.sha1(json.dumps(header, sort_keys=True).encode('utf-8'))
+        h.update(data)
+        file_id = h.hexdigest()
+        if file_id not in self._stored_ids and not self.fs.exists(file_id):
+            try:
+                self.fs.put(data, _id=file_id)
+            except gridfs.errors.FileExists:  # stored concurrently
+                pass
+        self._stored_ids.add(file_id)
+        return file_id
+
+
+class GridFSArray(object):
+    """
+    Reference to a numpy array in GridFS that is only fetched when it is
+    first used (through load() or np.asarray).
+    """
+    def __init__(self, fs, file_id, header):
+        self.fs = fs
+        self.file_id = file_id
+        self.header = header
+        self._array = None
+
+    def load(self):
+        if self._array is None:
+            data = self.fs.get(self.file_id).read()
+            self._array = decode_ndarray(self.header, data)
+        return self._array
+
+    def __array__(self, dtype=None):
+        array = self.load()
+        return array if dtype is None else array.astype(dtype)
+
+    def __repr__(self):
+        return "<GridFSArray '{}'>".format(self.file_id)
+
 
 class MongoDBReporter(ExperimentObserver):
-    def __init__(self, url=None, db_name='mlizard_experiments', save_delay=1):
+    """
+    Stores every run as a document in the experiments collection.
+
+    After the initial save only the changes to the info dict are sent as
+    targeted updates. With unacknowledged_updates=True these in-progress
+    updates do not wait for the server to acknowledge them.
+    If gridfs_threshold is given, arrays larger than that many bytes are
+    stored in GridFS instead of inside the document. Arrays are stored as raw
+    buffers which can be compressed with compression='zlib' or 'lz4'.
+    Every run stores the fingerprint of its inputs, so lookup_result can
+    find completed runs to reuse.
+    On connecting the given indexes are created if they do not exist (see
+    ensure_indexes). Add option_index(key) for options that are queried.
+    While a run is in progress its heartbeat field is set to the current
+    time every heartbeat_interval seconds (and with every update), so runs
+    whose process was killed can be found with mark_dead_runs.
+    """
+    def __init__(self, url=None, db_name='mlizard_experiments', save_delay=1,
+                 unacknowledged_updates=False, gridfs_threshold=None,
+                 compression=None, indexes=DEFAULT_INDEXES,
+                 heartbeat_interval=60):
         super(MongoDBReporter, self).__init__()
         self.experiment_skeleton = dict()
         self.experiment_entry = dict()
+        self.unsaved_delta = InfoDelta()
+        self.unsaved_metrics = dict()
         self.last_save = 0
         self.save_delay = save_delay
-        mongo = MongoClient(url)
-        self.db = mongo[db_name]
-        self.db.add_son_manipulator(PickleNumpyArrays())
+        self.unacknowledged_updates = unacknowledged_updates
+        self.url = url
+        self.db_name = db_name
+        self.gridfs_threshold = gridfs_threshold
+        self.compression = compression
+        self.indexes = indexes
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat = None
+        self.db = None
+        self.manipulator = None
+        self.collection = None
+
+    def connect(self):
+        """
+        Connect to the database. This happens on the first started event, so
+        creating a reporter is cheap and does not need a running server.
+        """
+        if self.collection is not None:
+            return
+        mongo = MongoClient(self.url)
+        self.db = mongo[self.db_name]
+        # GridFS is needed to read arrays even if this reporter stores none
+        self.manipulator = PickleNumpyArrays(gridfs.GridFS(self.db),
+                                             self.gridfs_threshold,
+                                             self.compression)
+        self.db.add_son_manipulator(self.manipulator)
         self.collection = self.db['experiments']
+        ensure_indexes(self.collection, self.indexes)
 
     def save(self):
         self.last_save = time.time()
         self.collection.save(self.experiment_entry)
+        self.unsaved_delta = InfoDelta()
+        self.unsaved_metrics = dict()
+
+    def update(self, info, delta, fields=None, acknowledged=True):
+        """
+        Send the given top-level fields, the changes to info since the last
+        save (the given delta and all deltas that were skipped), the logged
+        metrics and the heartbeat to the database using $set, $push and
+        $unset.
+        """
+        self.unsaved_delta.update(delta)
+        delta, self.unsaved_delta = self.unsaved_delta, InfoDelta()
+        set_fields = {'info.' + k: v for k, v in delta.changed.items()}
+        set_fields.update(fields or {})
+        set_fields['heartbeat'] = time.time()
+        push_fields = {'info.' + k: {'$each': v}
+                       for k, v in delta.appended.items()}
+        for name, m in self.unsaved_metrics.items():
+            if m['replace']:
+                set_fields['metrics.' + name] = {'steps': m['steps'],
+                                                 'values': m['values']}
+            else:
+                push_fields['metrics.{}.steps'.format(name)] = {
+                    '$each': m['steps']}
+                push_fields['metrics.{}.values'.format(name)] = {
+                    '$each': m['values']}
+        self.unsaved_metrics = dict()
+        update = {'$set': set_fields}
+        if push_fields:
+            update['$push'] = push_fields
+        if delta.removed:
+            update['$unset'] = {'info.' + k: '' for k in delta.removed}
+        self.experiment_entry.update(fields or {})
+        self.experiment_entry['info'] = info
+        self.last_save = time.time()
+        update = self.manipulator.transform_incoming(update, self.collection)
+        collection = self.collection
+        if self.unacknowledged_updates and not acknowledged:
+            collection = collection.with_options(
+                write_concern=WriteConcern(w=0))
+        collection.update_one({'_id': self.experiment_entry['_id']}, update)
+
+    def lookup_result(self, fingerprint):
+        self.connect()
+        entries = self.collection.find(
+            {'fingerprint': fingerprint, 'status': 'COMPLETED'},
+            {'result': True}).sort('stop_time', -1).limit(1)
+        for entry in entries:
+            return True, entry.get('result')
+        return False, None
 
     def experiment_created_event(self, name, stages, seed, mainfile, doc):
         self.experiment_skeleton['name'] = name
@@ -60,9 +289,10 @@ class MongoDBReporter(ExperimentObserver):
         self.experiment_skeleton['doc'] = doc
 
     def experiment_started_event(self, start_time, options, run_seed, args,
-                                 kwargs, info):
+                                 kwargs, info, run_id, fingerprint):
         # when an experiment starts, always make a new db entry
         # so we can rerun the same experiment and get multiple entries
+        self.connect()
         self.experiment_entry = deepcopy(self.experiment_skeleton)
 
         self.experiment_entry['start_time'] = start_time
@@ -70,30 +300,55 @@ class MongoDBReporter(ExperimentObserver):
         self.experiment_entry['seed'] = run_seed
         self.experiment_entry['args'] = args
         self.experiment_entry['kwargs'] = kwargs
+        self.experiment_entry['fingerprint'] = fingerprint
         self.experiment_entry['info'] = info
         self.experiment_entry['status'] = 'RUNNING'
+        self.experiment_entry['heartbeat'] = start_time
         self.save()
+        self.start_heartbeat()
 
-    def experiment_info_updated(self, info):
-        self.experiment_entry['info'] = info
+    def start_heartbeat(self):
+        self.stop_heartbeat()
+        if self.heartbeat_interval is None:
+            return
+        entry_id = self.experiment_entry['_id']
+
+        def beat():
+            self.collection.update_one({'_id': entry_id},
+                                       {'$set': {'heartbeat': time.time()}})
+
+        self.heartbeat = Heartbeat(beat, self.heartbeat_interval)
+        self.heartbeat.start()
+
+    def stop_heartbeat(self):
+        if self.heartbeat is not None:
+            self.heartbeat.stop()
+            self.heartbeat = None
+
+    def experiment_info_updated(self, info, delta, run_id):
         if time.time() >= self.last_save + self.save_delay:
-            self.save()
+            self.update(info, delta, acknowledged=False)
+        else:
+            self.unsaved_delta.update(delta)
 
-    def experiment_completed_event(self, stop_time, result, info):
-        self.experiment_entry['stop_time'] = stop_time
-        self.experiment_entry['result'] = result
-        self.experiment_entry['info'] = info
-        self.experiment_entry['status'] = 'COMPLETED'
-        self.save()
+    def experiment_metrics_updated(self, metrics, run_id):
+        # stored with the next update
+        merge_metrics(self.unsaved_metrics, metrics)
 
-    def experiment_interrupted_event(self, interrupt_time, info):
-        self.experiment_entry['stop_time'] = interrupt_time
-        self.experiment_entry['info'] = info
-        self.experiment_entry['status'] = 'INTERRUPTED'
-        self.save()
+    def experiment_completed_event(self, stop_time, result, info, delta,
+                                   run_id):
+        self.stop_heartbeat()
+        self.update(info, delta, {'stop_time': stop_time,
+                                  'result': result,
+                                  'status': 'COMPLETED'})
 
-    def experiment_failed_event(self, fail_time, info):
-        self.experiment_entry['stop_time'] = fail_time
-        self.experiment_entry['info'] = info
-        self.experiment_entry['status'] = 'FAILED'
-        self.save()
+    def experiment_interrupted_event(self, interrupt_time, info, delta,
+                                     run_id):
+        self.stop_heartbeat()
+        self.update(info, delta, {'stop_time': interrupt_time,
+                                  'status': 'INTERRUPTED'})
+
+    def experiment_failed_event(self, fail_time, info, delta, run_id):
+        self.stop_heartbeat()
+        self.update(info, delta, {'stop_time': fail_time,
+                                  'status': 'FAILED'})
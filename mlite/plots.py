@@ -2,13 +2,41 @@
 # coding=utf-8
 from __future__ import division, print_function, unicode_literals
 import inspect
+import multiprocessing
+import os
+import sys
 import time
-import matplotlib.pyplot as plt
+try:
+    from queue import Empty, Full
+except ImportError:
+    from Queue import Empty, Full
+from .metrics import ScalarLog
 from .observers import ExperimentObserver
 
 
 class LivePlot(ExperimentObserver):
-    def __init__(self, live_plot_function, fps=1, stop_at_completion=True):
+    """
+    Observer that sends the info of an experiment to a generator function
+    which updates a figure. Logged metrics are added to the info as a
+    ScalarLog (unless info has an entry with the same name) that is
+    downsampled to at most max_points values, keeping the minimum and
+    maximum of every block of steps. That way drawing takes the same time
+    no matter how long the experiment runs.
+
+    The generator first yields the figure. After that it can yield the
+    figure to get it redrawn completely, or a list of the artists it
+    changed. With blit=True only those are redrawn on top of the rest of
+    the figure, if the backend supports it.
+
+    With separate_process=True the figure is drawn by a child process, so
+    drawing never slows down the experiment. Frames are passed through a
+    queue that only holds the latest one; if the child falls behind, older
+    frames are dropped. If frame_dir is given every frame is also saved
+    there as a PNG file (using the Agg backend if there is no display).
+    """
+    def __init__(self, live_plot_function, fps=1, stop_at_completion=True,
+                 blit=True, max_points=2000, separate_process=False,
+                 frame_dir=None):
         if not inspect.isgeneratorfunction(live_plot_function):
             raise TypeError("Live plots must be generator functions!")
         self.f = live_plot_function
@@ -17,29 +45,179 @@ class LivePlot(ExperimentObserver):
         self.fps = fps
         self.last_update = 0
         self.stop_at_completion = stop_at_completion
+        self.blit = blit
+        self.max_points = max_points
+        self.metrics = dict()
+        self.artists = []
+        self.background = None
+        self.separate_process = separate_process
+        self.frame_dir = frame_dir
+        self.frame_count = 0
+        self._frames = None
+        self._renderer = None
 
     def start_plot(self):
+        if (self.frame_dir is not None and 'DISPLAY' not in os.environ and
+                'matplotlib.pyplot' not in sys.modules):
+            import matplotlib
+            matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
         plt.ion()
         self.f_run = self.f()
-        self.fig = self.f_run.next()
+        self.fig = next(self.f_run)
+        self.artists = []
+        self.background = None
+        if self.blit and self.fig.canvas.supports_blit:
+            self.fig.canvas.mpl_connect('draw_event', self._on_draw)
 
     def update_plot(self, info):
-        self.f_run.send(info)
-        self.fig.canvas.draw()
+        info = dict(info)
+        for name, log in self.metrics.items():
+            info.setdefault(name, log)
+        # avoid the automatic redraws of interactive mode, the figure is
+        # drawn explicitly after the plot function modified it
+        callback, self.fig.stale_callback = self.fig.stale_callback, None
+        try:
+            self.draw(self.f_run.send(info))
+        finally:
+            self.fig.stale_callback = callback
+        self.fig.canvas.flush_events()
+        if self.frame_dir is not None:
+            self.fig.savefig(os.path.join(
+                self.frame_dir, 'frame_{:06d}.png'.format(self.frame_count)))
+        self.frame_count += 1
         self.last_update = time.time()
 
-    def experiment_info_updated(self, info):
+    def show(self, info, final=False):
+        """
+        Draw the figure for info, in a child process if separate_process is
+        set. After the final frame the figure stays open if
+        stop_at_completion is set.
+        """
+        if self.separate_process:
+            self._send_frame(info, final)
+            return
         if self.f_run is None:
             self.start_plot()
-        if self.last_update + 1.0/self.fps < time.time():
-            self.update_plot(info)
-
-    def experiment_completed_event(self, stop_time, result, info):
         self.update_plot(info)
-        if self.stop_at_completion:
+        if final and self.stop_at_completion:
+            import matplotlib.pyplot as plt
             plt.ioff()
             plt.show()
 
+    def close(self):
+        """
+        Stop the child process without waiting for the remaining frames.
+        """
+        if self._renderer is not None:
+            self._drop_stale_frame()
+            self._frames.put(None)
+            self._renderer.join()
+            self._renderer = None
+
+    def _send_frame(self, info, final):
+        info = dict(info)
+        for name, log in self.metrics.items():
+            info.setdefault(name, log)
+        if self._renderer is None:
+            self._start_renderer()
+        self._drop_stale_frame()
+        if final:
+            self._frames.put((info, True))
+            self._renderer.join()  # until the figure is closed
+            self._renderer = None
+        else:
+            try:
+                self._frames.put_nowait((info, False))
+            except Full:  # the child is taking a frame right now
+                pass
+        self.last_update = time.time()
+
+    def _start_renderer(self):
+        plot = LivePlot(self.f, self.fps, self.stop_at_completion, self.blit,
+                        self.max_points, frame_dir=self.frame_dir)
+        self._frames = multiprocessing.Queue(maxsize=1)
+        self._renderer = multiprocessing.Process(
+            target=_render_frames, args=(plot, self._frames),
+            name='mlite-live-plot')
+        self._renderer.daemon = True
+        self._renderer.start()
+
+    def _drop_stale_frame(self):
+        try:
+            self._frames.get_nowait()
+        except Empty:
+            pass
+
+    def draw(self, artists):
+        canvas = self.fig.canvas
+        if not self.blit or not canvas.supports_blit or artists is self.fig:
+            canvas.draw()
+            return
+        if list(artists) != self.artists:
+            for a in self.artists:
+                a.set_animated(False)
+            for a in artists:
+                a.set_animated(True)
+            self.artists = list(artists)
+            self.background = None
+        if self.background is None:
+            canvas.draw()  # calls _on_draw
+        else:
+            canvas.restore_region(self.background)
+            self._draw_artists()
+        canvas.blit(self.fig.bbox)
+
+    def _on_draw(self, event):
+        # animated artists are not part of a full draw, so store everything
+        # else as the background and draw them on top
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_artists()
+
+    def _draw_artists(self):
+        for a in self.artists:
+            self.fig.draw_artist(a)
+
+    def experiment_started_event(self, start_time, options, run_seed, args,
+                                 kwargs, info, run_id, fingerprint):
+        self.metrics = dict()
+
+    def experiment_metrics_updated(self, metrics, run_id):
+        for name, m in metrics.items():
+            if name not in self.metrics:
+                self.metrics[name] = ScalarLog('minmax', self.max_points)
+            log = self.metrics[name]
+            if m['replace']:
+                log.clear()
+            for step, value in zip(m['steps'], m['values']):
+                log.append(value, step)
+
+    def experiment_info_updated(self, info, delta, run_id):
+        if self.last_update + 1.0/self.fps < time.time():
+            self.show(info)
+
+    def experiment_completed_event(self, stop_time, result, info, delta,
+                                   run_id):
+        self.show(info, final=True)
+
+    def experiment_interrupted_event(self, interrupt_time, info, delta,
+                                     run_id):
+        self.close()
+
+    def experiment_failed_event(self, fail_time, info, delta, run_id):
+        self.close()
+
+
+def _render_frames(plot, frames):
+    while True:
+        frame = frames.get()
+        if frame is None:
+            return
+        info, final = frame
+        plot.show(info, final)
+        if final:
+            return
+
 
 
 
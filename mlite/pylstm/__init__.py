@@ -2,63 +2,102 @@
 # coding=utf-8
 
 from __future__ import division, print_function, unicode_literals
+from collections import namedtuple
 import numpy as np
-import matplotlib.pyplot as plt
+from ..checkpoints import TopKStore
+from ..metrics import ScalarLog
 from ..plots import LivePlot
 
 
 class InfoUpdater(object):
-    def __init__(self, experiment):
+    """
+    Logs the training and validation errors as metrics of the experiment and
+    stores some information about the network in its info. The retention and
+    size of the error metrics can be configured as in Experiment.metric.
+    """
+    def __init__(self, experiment, retention=None, size=None):
         self.ex = experiment
+        self.ex.metric('training_errors', retention, size)
+        self.ex.metric('validation_errors', retention, size)
 
     def __call__(self, epoch, net, training_errors, validation_errors):
         self.ex.info['epochs_needed'] = epoch
-        self.ex.info['training_errors'] = training_errors
-        self.ex.info['validation_errors'] = validation_errors
+        self._log('training_errors', training_errors)
+        self._log('validation_errors', validation_errors)
         if 'nr_parameters' not in self.ex.info:
             self.ex.info['nr_parameters'] = net.get_param_size()
         if 'architecture' not in self.ex.info:
             self.ex.info['architecture'] = net.architecture
         self.ex._emit_info_updated()
 
+    def _log(self, name, errors):
+        # only the errors of epochs since the last call are new
+        for error in errors[self.ex.metric(name).count:]:
+            self.ex.log_scalar(name, error)
+
 
 def get_min_err(errors):
     min_epoch = np.argmin(errors)
     return min_epoch, errors[min_epoch]
 
 
+_ErrorLog = namedtuple('_ErrorLog', 'steps values min max last_step')
+
+
+def _error_log(errors):
+    # logged metrics are ScalarLogs that track their minimum and maximum,
+    # other code (and older versions) put plain lists of errors into info
+    if errors is None or len(errors) == 0:
+        return None
+    if isinstance(errors, ScalarLog):
+        if errors.min is None:
+            return None
+        return _ErrorLog(errors.steps, errors.values, errors.min, errors.max,
+                        errors.last_step)
+    values = np.asarray(errors, dtype=np.float64)
+    low, high = int(np.argmin(values)), int(np.argmax(values))
+    return _ErrorLog(np.arange(len(values)), values, (low, values[low]),
+                    (high, values[high]), len(values) - 1)
+
+
 def plot_train_and_val_error():
+    import matplotlib.pyplot as plt
     fig, ax = plt.subplots()
     ax.set_title('Training Progress')
     ax.set_xlabel('Epochs')
     ax.set_ylabel('Error')
-    info = yield fig
-    t_line = None
-    v_line = None
-    v_dot = None
-    if 'training_errors' in info:
-        t_line, = ax.plot(info['training_errors'], 'g-', label='Training Error')
-    if 'validation_errors' in info and len(info['validation_errors']) > 0:
-        val_err = info['validation_errors']
-        v_line, = ax.plot(val_err, 'b-', label='Validation Error')
-        min_ep, min_err = get_min_err(val_err)
-        v_dot, = ax.plot([min_ep], min_err, 'bo')
+    t_line, = ax.plot([], [], 'g-', label='Training Error')
+    v_line, = ax.plot([], [], 'b-', label='Validation Error')
+    v_dot, = ax.plot([], [], 'bo')
     ax.legend()
+    view = None  # (max epoch, min error, max error) of the visible area
+    info = yield fig
     while True:
-        info = yield fig
-        if t_line is not None:
-            train_err = info['training_errors']
-            t_line.set_ydata(train_err)
-            t_line.set_xdata(range(len(train_err)))
-        if v_line is not None:
-            val_err = info['validation_errors']
-            v_line.set_ydata(val_err)
-            v_line.set_xdata(range(len(val_err)))
-            min_ep, min_err = get_min_err(val_err)
-            v_dot.set_ydata([min_err])
-            v_dot.set_xdata([min_ep])
-        ax.relim()
-        ax.autoscale_view()
+        logs = dict()
+        for name, line in [('training_errors', t_line),
+                           ('validation_errors', v_line)]:
+            log = _error_log(info.get(name))
+            if log is not None:
+                line.set_data(log.steps, log.values)
+                logs[name] = log
+        if 'validation_errors' in logs:
+            v_min = logs['validation_errors'].min
+            v_dot.set_data([v_min[0]], [v_min[1]])
+        redraw = False
+        if logs:
+            last = max(log.last_step for log in logs.values())
+            low = min(log.min[1] for log in logs.values())
+            high = max(log.max[1] for log in logs.values())
+            # only rescale (and redraw everything) if the data leaves the
+            # visible area, the epochs get twice the space they need
+            if (view is None or last > view[0] or low < view[1] or
+                    high > view[2]):
+                margin = 0.05 * ((high - low) or abs(high) or 1.)
+                view = (max(2 * last, 10), low - margin, high + margin)
+                ax.set_xlim(0, view[0])
+                ax.set_ylim(view[1], view[2])
+                redraw = True
+        info = yield fig if redraw else [t_line, v_line, v_dot]
 
 TrainingProgressPlot = LivePlot(plot_train_and_val_error,
                                 fps=2,
@@ -66,11 +105,30 @@ TrainingProgressPlot = LivePlot(plot_train_and_val_error,
 
 
 class StoreBestWeights(object):
-    def __init__(self, ex):
+    """
+    Keeps the weights of the k epochs with the lowest validation error (or
+    training error if there is no validation set) in a TopKStore and puts
+    references to them into info['best_weights']. The weights are written
+    to disk in directory (see the 'file' of the references), which is left
+    in place after the run. Call close() after training to make sure all of
+    them are written.
+    """
+    def __init__(self, ex, directory, k=1):
         self.ex = ex
+        self.k = k
+        self.directory = directory
+        self.store = None
 
     def __call__(self, epoch, net, training_errors, validation_errors):
         e = validation_errors if len(validation_errors) > 0 else training_errors
-        if np.argmin(e) == len(e) - 1:
-            self.ex.info['weights'] = net.param_buffer.copy()
-            self.ex._emit_info_updated()
\ No newline at end of file
+        weights = net.param_buffer
+        if self.store is None:
+            self.store = TopKStore(self.k, weights.shape, weights.dtype,
+                                   self.directory)
+        if self.store.offer(e[-1], weights, epoch) is not None:
+            self.ex.info['best_weights'] = self.store.references()
+            self.ex._emit_info_updated()
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
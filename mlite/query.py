@@ -0,0 +1,126 @@
+#!/usr/bin/python
+# coding=utf-8
+from __future__ import division, print_function, unicode_literals
+import numbers
+import numpy as np
+
+
+def open_collection(url=None, db_name='mlizard_experiments'):
+    """
+    Return the experiments collection the MongoDBReporter with the same
+    arguments writes to, set up to decode stored arrays. No indexes are
+    created (see mlite.dbtools).
+    """
+    from .observers.mongodb import MongoDBReporter
+    reporter = MongoDBReporter(url, db_name, indexes=())
+    reporter.connect()
+    return reporter.collection
+
+
+def build_filter(name=None, status=None, options=None):
+    """
+    Return the query for runs of the experiment name with the given status
+    (or one of a list of them) whose options contain the given values.
+    Nested options are addressed with dotted keys like 'optimizer.lr'.
+    """
+    query = dict()
+    if name is not None:
+        query['name'] = name
+    if isinstance(status, (list, tuple, set)):
+        query['status'] = {'$in': list(status)}
+    elif status is not None:
+        query['status'] = status
+    for key, value in (options or {}).items():
+        query['options.' + key] = value
+    return query
+
+
+def build_projection(fields=('options', 'result'), metrics=(),
+                     metric_tail=None):
+    """
+    Return the projection for the given (dotted) fields and metrics. If
+    metric_tail is given only that many of the last values of every metric
+    are fetched.
+    """
+    projection = {f: True for f in fields}
+    for name in metrics:
+        for part in ['steps', 'values']:
+            key = 'metrics.{}.{}'.format(name, part)
+            if metric_tail is None:
+                projection[key] = True
+            else:
+                projection[key] = {'$slice': -metric_tail}
+    return projection
+
+
+def iter_runs(collection, name=None, status=None, options=None,
+              fields=('options', 'result'), metrics=(), metric_tail=None,
+              sort=None, batch_size=500):
+    """
+    Yield the matching run documents (see build_filter and
+    build_projection). They are fetched from the server in batches of
+    batch_size, sort is a list of (key, direction) pairs.
+    """
+    cursor = collection.find(build_filter(name, status, options),
+                             build_projection(fields, metrics, metric_tail))
+    cursor = cursor.batch_size(batch_size)
+    if sort:
+        cursor = cursor.sort(sort)
+    for run in cursor:
+        yield run
+
+
+def query_runs(collection, name=None, status=None, options=None,
+               fields=('options', 'result'), metrics=(), metric_tail=None,
+               sort=None, batch_size=500):
+    """
+    Return the matching runs as columns, see iter_runs and to_columns. E.g.
+    query_runs(collection, name='mnist', status='COMPLETED', metrics=['loss'],
+    metric_tail=1) returns one array per option ('options.learning_rate',
+    ...), the column 'result' and the last logged loss of every run as
+    'metrics.loss.values'.
+    """
+    return to_columns(iter_runs(collection, name, status, options, fields,
+                                metrics, metric_tail, sort, batch_size))
+
+
+def to_columns(runs):
+    """
+    Return a dict that maps every (dotted) key found in the run documents to
+    a numpy array with one entry per run. Booleans, integers and floats get
+    a numeric column (missing numbers are NaN), lists become arrays and
+    everything else is stored in object columns with None where missing.
+    """
+    rows = [_flatten(run) for run in runs]
+    keys = set()
+    for row in rows:
+        keys.update(row)
+    return {key: _column([row.get(key) for row in rows]) for key in keys}
+
+
+def _flatten(doc, prefix=''):
+    row = dict()
+    for key, value in doc.items():
+        name = prefix + key
+        if isinstance(value, dict) and value.get('_type') != 'ndarray':
+            row.update(_flatten(value, name + '.'))
+        else:
+            row[name] = value
+    return row
+
+
+def _column(values):
+    present = [v for v in values if v is not None]
+    complete = len(present) == len(values)
+    if present and all(isinstance(v, (bool, np.bool_)) for v in present):
+        if complete:
+            return np.array(values, dtype=bool)
+    elif present and all(isinstance(v, numbers.Real) for v in present):
+        if complete and all(isinstance(v, numbers.Integral) for v in present):
+            return np.array(values, dtype=np.int64)
+        return np.array([np.nan if v is None else v for v in values],
+                        dtype=np.float64)
+    column = np.empty(len(values), dtype=object)
+    for i, v in enumerate(values):
+        column[i] = np.asarray(v) if isinstance(v, list) else v
+    return column
@@ -4,6 +4,8 @@ from __future__ import division, print_function, unicode_literals
 from collections import OrderedDict
 import inspect
 
+MAX_BINDING_PLANS = 64
+
 
 class Signature:
     """
@@ -24,6 +26,7 @@ class Signature:
         defaults = defaults or []
         self.positional_args = args[:len(args) - len(defaults)]
         self.kwargs = OrderedDict(zip(args[-len(defaults):], defaults))
+        self._binding_plans = dict()
 
     def get_free_parameters(self, args, kwargs):
         return [a for a in self.arguments[len(args):] if a not in kwargs]
@@ -38,13 +41,38 @@ class Signature:
             * kwargs contains one or more unexpected keyword arguments
             * conflicting values for a parameter in both args and kwargs
             * there is an unfilled parameter at the end of this process
+
+        The checks only depend on the number of args and the names of the
+        kwargs, so their outcome is cached per call shape in a binding plan.
+        """
+        shape = (len(args), frozenset(kwargs))
+        plan = self._binding_plans.get(shape)
+        if plan is None:
+            plan = self._compile_binding_plan(args, kwargs)
+            if len(self._binding_plans) >= MAX_BINDING_PLANS:
+                self._binding_plans.clear()
+            self._binding_plans[shape] = plan
+        free_params, required_params = plan
+        for p in free_params:
+            if p in options:
+                kwargs[p] = options[p]
+        for p in required_params:
+            if p not in kwargs:
+                raise TypeError("{} is missing value(s) for {}".format(
+                    self.name, [f for f in free_params if f not in kwargs]))
+        return args, kwargs
+
+    def _compile_binding_plan(self, args, kwargs):
+        """
+        Check args and kwargs for unexpected or duplicate arguments and return
+        the free parameters and those among them that have no default.
         """
         self._assert_no_unexpected_args(args)
         self._assert_no_unexpected_kwargs(kwargs)
         self._assert_no_duplicate_args(args, kwargs)
-        args, kwargs = self._fill_in_options(args, kwargs, options)
-        self._assert_no_missing_args(args, kwargs)
-        return args, kwargs
+        free_params = tuple(self.get_free_parameters(args, kwargs))
+        required_params = tuple(p for p in free_params if p not in self.kwargs)
+        return free_params, required_params
 
     def __unicode__(self):
         args = self.positional_args
@@ -87,17 +115,3 @@ class Signature:
         if duplicate_arguments:
             raise TypeError("{} got multiple values for argument(s) {}".format(
                 self.name, duplicate_arguments))
-
-    def _fill_in_options(self, args, kwargs, options):
-        free_params = self.get_free_parameters(args, kwargs)
-        for f in free_params:
-            if f in options:
-                kwargs[f] = options[f]
-        return args, kwargs
-
-    def _assert_no_missing_args(self, args, kwargs):
-        free_params = self.get_free_parameters(args, kwargs)
-        missing_args = [m for m in free_params if m not in self.kwargs]
-        if missing_args:
-            raise TypeError("{} is missing value(s) for {}".format(
-                self.name, free_params))
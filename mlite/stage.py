@@ -2,21 +2,78 @@
 # coding=utf-8
 from datetime import timedelta
 import inspect
+import random
 import time
+import numpy as np
 from numpy.random import RandomState
 
 from .signature import Signature
-from mlite.utils import generate_seed
+from mlite.utils import generate_seed, GeneratorPool
+
+RNG_MODES = ('legacy', 'pcg64')
+
+
+class StageMetrics(object):
+    """
+    Aggregated statistics about the calls of a stage. Percentiles of the
+    call durations are estimated from a reservoir sample of sample_size calls.
+    """
+    def __init__(self, sample_size=1024):
+        self.calls = 0
+        self.exceptions = 0
+        self.cache_hits = 0
+        self.total_time = 0.0
+        self.min_time = float('inf')
+        self.max_time = 0.0
+        self._sample = np.empty(sample_size)
+        self._rnd = random.Random(0)
+
+    def add(self, duration, failed=False):
+        self.calls += 1
+        self.exceptions += failed
+        self.total_time += duration
+        self.min_time = min(self.min_time, duration)
+        self.max_time = max(self.max_time, duration)
+        if self.calls <= len(self._sample):
+            self._sample[self.calls - 1] = duration
+        else:
+            i = self._rnd.randint(0, self.calls - 1)
+            if i < len(self._sample):
+                self._sample[i] = duration
+
+    def summary(self, percentiles=(50, 90, 99)):
+        summary = {'calls': self.calls,
+                   'exceptions': self.exceptions,
+                   'cache_hits': self.cache_hits,
+                   'total_time': self.total_time}
+        if self.calls > 0:
+            sample = self._sample[:min(self.calls, len(self._sample))]
+            summary['mean_time'] = self.total_time / self.calls
+            summary['min_time'] = self.min_time
+            summary['max_time'] = self.max_time
+            for p, t in zip(percentiles, np.percentile(sample, percentiles)):
+                summary['p{}_time'.format(p)] = float(t)
+        return summary
 
 
 class StageFunction(object):
-    def __init__(self, f, default_options=()):
+    def __init__(self, f, default_options=(), cache=None, rng='legacy'):
+        if rng not in RNG_MODES:
+            raise ValueError("Unknown rng '{}'. Use one of {}".format(
+                rng, RNG_MODES))
+        self.cache = cache
+        self.resumable = False
+        self.run_cache = None  # stores the results of a resumable stage
+        self.rng = rng
         self.logger = None
+        self.metrics = StageMetrics()
+        self.tracer = None
         self.__doc__ = f.__doc__
         self.__name__ = f.__name__
         self._default_options = default_options
         self._seed = None
         self._signature = Signature(f)
+        self._takes_rnd = 'rnd' in self._signature.arguments
         self._source = str(inspect.getsource(f))
         self._wrapped_function = f
 
@@ -27,26 +84,61 @@ class StageFunction(object):
     @seed.setter
     def seed(self, new_seed):
         self._seed = new_seed
-        self.rnd = RandomState(self.seed)
+        if self.rng == 'pcg64':
+            self.rnd = GeneratorPool(new_seed)
+        else:
+            self.rnd = RandomState(new_seed)
 
     def execute(self, args, kwargs, options):
-        opt = dict()
-        opt.update(options)
-        if 'rnd' in self._signature.arguments:
+        if self.tracer is not None:
+            with self.tracer.span(self.__name__, 'stage'):
+                return self._execute(args, kwargs, options)
+        return self._execute(args, kwargs, options)
+
+    def _execute(self, args, kwargs, options):
+        seed = None
+        if self._takes_rnd and self.rng == 'pcg64':
+            seed = (self.rnd.seed_sequence.entropy,
+                    self.rnd.seed_sequence.spawn_key, self.rnd.nr_generated)
+            options = dict(options, rnd=self.rnd.next())
+        elif self._takes_rnd:
             seed = generate_seed(self.rnd)
-            opt['rnd'] = RandomState(seed)
-        args, kwargs = self._signature.construct_arguments(args, kwargs, opt)
+            options = dict(options, rnd=RandomState(seed))
+        args, kwargs = self._signature.construct_arguments(args, kwargs,
+                                                           options)
+        cache = self.cache if self.cache is not None else self.run_cache
+        cache_key = self._get_cache_key(cache, args, kwargs, seed)
+        if cache_key is not None:
+            found, result = cache.get(cache_key)
+            if found:
+                self.metrics.cache_hits += 1
+                self.logger.info("Stage result loaded from cache.")
+                return result
         start_time = time.time()
         # self.emit('stage_started', self.__name__, start_time, args, kwargs)
         self.logger.info("Stage started.")
-        ####################### run actual function ############################
-        result = self._wrapped_function(*args, **kwargs)
-        ########################################################################
+        try:
+            ##################### run actual function ########################
+            result = self._wrapped_function(*args, **kwargs)
+            ################################################################
+        except:
+            self.metrics.add(time.time() - start_time, failed=True)
+            raise
         stop_time = time.time()
+        self.metrics.add(stop_time - start_time)
         elapsed_time = timedelta(seconds=round(stop_time - start_time))
         self.logger.info("Stage completed after %s.", elapsed_time)
         # self.emit('stage_completed', self.__name__, stop_time)
+        if cache_key is not None:
+            cache.put(cache_key, result)
         return result
 
+    def _get_cache_key(self, cache, args, kwargs, seed):
+        if cache is None:
+            return None
+        # the injected RandomState is represented by its seed
+        kwargs = {k: v for k, v in kwargs.items() if k != 'rnd'}
+        return cache.key(self._source, args, kwargs, seed)
+
     def __call__(self, *args, **kwargs):
         return self.execute(args, kwargs, self._default_options)
\ No newline at end of file
@@ -0,0 +1,101 @@
+#!/usr/bin/python
+# coding=utf-8
+from __future__ import division, print_function, unicode_literals
+from collections import namedtuple
+from copy import deepcopy
+import itertools
+import multiprocessing
+import traceback
+from numpy.random import RandomState
+from .utils import generate_seed
+
+
+SweepResult = namedtuple('SweepResult',
+                         ['index', 'options', 'seed', 'result', 'error'])
+
+
+def grid(**axes):
+    """
+    Return a list of option overrides containing every combination of the
+    given values, e.g. grid(a=[1, 2], b=[3]) == [{a: 1, b: 3}, {a: 2, b: 3}].
+    """
+    keys = sorted(axes)
+    return [dict(zip(keys, values))
+            for values in itertools.product(*[axes[k] for k in keys])]
+
+
+def run_sweep(experiment, overrides, processes=None, observers=None):
+    """
+    Run the experiment once for every entry in overrides using a pool of
+    worker processes and yield a SweepResult for each run as it completes.
+
+    Every override is either a dict that is used to update the options of the
+    experiment or the name of an option section (like for optionset).
+    Each run gets its own seed which is derived from the experiment seed and
+    the position of the run in overrides, so sweeps are repeatable.
+    observers is a callable that is called once in every worker and returns
+    the observers to use there. Failed runs are reported with the formatted
+    traceback as error instead of raising.
+
+    Workers are forked so the experiment does not need to be picklable, but
+    the overrides and results do.
+    """
+    tasks = _sweep_tasks(experiment, overrides)
+    ctx = multiprocessing
+    if hasattr(multiprocessing, 'get_context'):
+        ctx = multiprocessing.get_context('fork')
+    pool = ctx.Pool(processes, initializer=_initialize_worker,
+                    initargs=(experiment, observers))
+    try:
+        for index, result, error in pool.imap_unordered(_run_in_worker, tasks):
+            _, options, seed = tasks[index]
+            yield SweepResult(index, options, seed, result, error)
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _sweep_tasks(experiment, overrides):
+    # (index, options, seed) of every run
+    run_options = [_resolve_override(experiment.options, o) for o in overrides]
+    base_seed = experiment.seed
+    if base_seed is None:
+        base_seed = experiment.options.get('seed', generate_seed())
+    rnd = RandomState(base_seed)
+    return [(i, o, o.get('seed', generate_seed(rnd)))
+            for i, o in enumerate(run_options)]
+
+
+def _configure_run(experiment, base_options, overrides, seed):
+    # stages keep a reference to the options dict, so update it in place
+    experiment.options.clear()
+    experiment.options.update(deepcopy(base_options))
+    experiment.options.update(overrides)
+    experiment.seed = seed
+    experiment.info = dict()
+
+
+def _resolve_override(options, override):
+    if isinstance(override, dict):
+        return override
+    return dict(options[override])
+
+
+_worker_state = None
+
+
+def _initialize_worker(experiment, observers):
+    global _worker_state
+    experiment._observers = list(observers()) if observers is not None else []
+    _worker_state = experiment, deepcopy(experiment.options)
+
+
+def _run_in_worker(task):
+    index, overrides, seed = task
+    ex, base_options = _worker_state
+    _configure_run(ex, base_options, overrides, seed)
+    try:
+        return index, ex.run(), None
+    except Exception:
+        return index, None, traceback.format_exc()
@@ -0,0 +1,97 @@
+#!/usr/bin/python
+# coding=utf-8
+from __future__ import division, print_function, unicode_literals
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from mlite.utils import NO_LOGGER
+from ..cache import StageCache
+from ..stage import StageFunction
+
+
+def create_cached_stage(f, cache):
+    s = StageFunction(f, default_options=(), cache=cache)
+    s.seed = 0
+    s.logger = NO_LOGGER
+    return s
+
+
+class StageCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = StageCache(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_get_missing_key(self):
+        self.assertEqual(self.cache.get('abc'), (False, None))
+
+    def test_put_and_get_roundtrip(self):
+        self.cache.put('abc', {'a': [1, 2, 3]})
+        self.assertEqual(self.cache.get('abc'), (True, {'a': [1, 2, 3]}))
+
+    def test_arrays_are_loaded_memory_mapped(self):
+        self.cache.put('abc', np.arange(10))
+        found, result = self.cache.get('abc')
+        self.assertTrue(found)
+        self.assertIsInstance(result, np.memmap)
+        self.assertTrue(np.all(result == np.arange(10)))
+
+    def test_key_depends_on_source_args_and_seed(self):
+        k = self.cache.key('def f(a): pass', [1], {'b': 2}, 3)
+        self.assertEqual(k, self.cache.key('def f(a): pass', [1], {'b': 2}, 3))
+        self.assertNotEqual(k, self.cache.key('def g(a): pass', [1], {'b': 2},
+                                              3))
+        self.assertNotEqual(k, self.cache.key('def f(a): pass', [2], {'b': 2},
+                                              3))
+        self.assertNotEqual(k, self.cache.key('def f(a): pass', [1], {'b': 3},
+                                              3))
+        self.assertNotEqual(k, self.cache.key('def f(a): pass', [1], {'b': 2},
+                                              4))
+
+    def test_key_for_unpicklable_arguments_is_none(self):
+        self.assertIsNone(self.cache.key('', [lambda x: x], {}, None))
+
+    def test_evict_removes_least_recently_used(self):
+        self.cache.put('old', np.zeros(100))
+        self.cache.put('new', np.zeros(100))
+        old_path = os.path.join(self.directory, 'old.npy')
+        os.utime(old_path, (0, 0))
+        size = os.path.getsize(old_path)
+        self.cache.evict(size)
+        self.assertFalse(self.cache.get('old')[0])
+        self.assertTrue(self.cache.get('new')[0])
+
+    def test_stage_results_are_cached(self):
+        calls = []
+
+        def expensive(a, b=2):
+            calls.append(a)
+            return a * b
+
+        s = create_cached_stage(expensive, self.cache)
+        self.assertEqual(s(3), 6)
+        self.assertEqual(s(3), 6)
+        self.assertEqual(calls, [3])
+        self.assertEqual(s(3, b=3), 9)
+        self.assertEqual(calls, [3, 3])
+
+    def test_stage_cache_is_keyed_by_seed(self):
+        calls = []
+
+        def test(rnd):
+            calls.append(1)
+            return rnd.randint(5, 1000000)
+
+        s = create_cached_stage(test, self.cache)
+        a1 = s()
+        s.seed = 0
+        a2 = s()
+        self.assertEqual(a1, a2)
+        self.assertEqual(len(calls), 1)
+        s.seed = 1
+        s()
+        self.assertEqual(len(calls), 2)
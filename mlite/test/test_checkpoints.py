@@ -0,0 +1,88 @@
+#!/usr/bin/python
+# coding=utf-8
+from __future__ import division, print_function, unicode_literals
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from mlite.utils import NO_LOGGER
+from ..checkpoints import TopKStore
+from ..experiment import Experiment
+from ..pylstm import StoreBestWeights
+
+
+class TopKStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_keeps_k_lowest_scores(self):
+        store = TopKStore(2, (3,))
+        for step, score in enumerate([5, 4, 6, 3, 4.5]):
+            store.offer(score, np.full(3, score), step)
+        refs = store.references()
+        self.assertEqual([r['score'] for r in refs], [3, 4])
+        self.assertEqual([r['step'] for r in refs], [3, 1])
+        self.assertTrue(np.all(store.get(refs[0]['slot']) == 3))
+        score, step, array = store.best
+        self.assertEqual((score, step), (3, 3))
+
+    def test_offer_copies_into_preallocated_slots(self):
+        store = TopKStore(1, (3,))
+        slots = store.get(0)
+        weights = np.zeros(3)
+        self.assertEqual(store.offer(1., weights), 0)
+        weights[:] = 7
+        self.assertTrue(np.all(store.get(0) == 0))
+        self.assertIsNone(store.offer(2., weights))
+        self.assertEqual(store.offer(0.5, weights), 0)
+        self.assertIs(store.get(0).base, slots.base)
+        self.assertTrue(np.all(store.get(0) == 7))
+
+    def test_stores_in_memory_mapped_file(self):
+        store = TopKStore(2, (2, 2), np.float32, self.directory)
+        store.offer(2., np.ones((2, 2)), 0)
+        store.offer(1., np.zeros((2, 2)), 1)
+        store.close()
+        with open(os.path.join(self.directory, 'checkpoints.json')) as f:
+            refs = json.load(f)
+        self.assertEqual([r['step'] for r in refs], [1, 0])
+        data = np.load(refs[0]['file'], mmap_mode='r')
+        self.assertEqual(data.shape, (2, 2, 2))
+        self.assertEqual(data.dtype, np.float32)
+        self.assertTrue(np.all(data[refs[0]['slot']] == 0))
+        self.assertTrue(np.all(data[refs[1]['slot']] == 1))
+
+
+class FakeNet(object):
+    def __init__(self):
+        self.param_buffer = np.zeros(4)
+
+
+class StoreBestWeightsTest(unittest.TestCase):
+    def test_info_only_contains_references(self):
+        ex = Experiment('test', seed=1, logger=NO_LOGGER)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        store_weights = StoreBestWeights(ex, directory, k=2)
+        net = FakeNet()
+
+        @ex.main
+        def main():
+            errors = []
+            for epoch, error in enumerate([3, 2, 4, 1, 5]):
+                errors.append(error)
+                net.param_buffer[:] = epoch
+                store_weights(epoch, net, [], errors)
+
+        ex.run()
+        store_weights.close()
+        refs = ex.info['best_weights']
+        self.assertEqual([r['step'] for r in refs], [3, 1])
+        self.assertTrue(np.all(store_weights.store.get(refs[0]['slot']) == 3))
+        data = np.load(refs[0]['file'], mmap_mode='r')
+        self.assertTrue(np.all(data[refs[0]['slot']] == 3))
@@ -0,0 +1,102 @@
+#!/usr/bin/python
+# coding=utf-8
+from __future__ import division, print_function, unicode_literals
+import time
+import unittest
+
+try:
+    from couchdb.http import ResourceConflict
+    from ..observers.couchdb import CouchDBReporter
+except ImportError:
+    ResourceConflict = None
+
+
+class FakeCouchDB(object):
+    def __init__(self):
+        self.docs = dict()
+        self.bulk_updates = []
+
+    def update(self, docs):
+        self.bulk_updates.append(sorted(d['_id'] for d in docs))
+        results = []
+        for doc in docs:
+            stored = self.docs.get(doc['_id'])
+            if doc.get('_rev') != (stored or {}).get('_rev'):
+                results.append((False, doc['_id'], ResourceConflict()))
+                continue
+            rev = str(int(stored['_rev']) + 1 if stored else 1)
+            self.docs[doc['_id']] = dict(doc, _rev=rev)
+            results.append((True, doc['_id'], rev))
+        return results
+
+    def __getitem__(self, doc_id):
+        return self.docs[doc_id]
+
+    def touch(self, doc_id):
+        # a concurrent write by someone else
+        doc = self.docs[doc_id]
+        doc['_rev'] = str(int(doc['_rev']) + 1)
+
+
+@unittest.skipIf(ResourceConflict is None, 'couchdb is not installed')
+class CouchDBReporterTest(unittest.TestCase):
+    def setUp(self):
+        self.db = FakeCouchDB()
+
+    def create_reporter(self, **kwargs):
+        reporter = CouchDBReporter(**kwargs)
+        reporter.db = self.db
+        reporter.experiment_created_event('test', [], 1, 'test.py', None)
+        return reporter
+
+    def start(self, reporter, run_id):
+        reporter.experiment_started_event(0, {}, 1, (), {}, {}, run_id, None)
+
+    def test_status_is_stored(self):
+        reporter = self.create_reporter()
+        for run_id in ['a', 'b', 'c']:
+            self.start(reporter, run_id)
+        self.assertEqual(self.db['a']['status'], 'RUNNING')
+        reporter.experiment_completed_event(1, 5, {}, None, 'a')
+        reporter.experiment_interrupted_event(1, {}, None, 'b')
+        reporter.experiment_failed_event(1, {}, None, 'c')
+        self.assertEqual([self.db[r]['status'] for r in 'abc'],
+                         ['COMPLETED', 'INTERRUPTED', 'FAILED'])
+        self.assertEqual(self.db['a']['result'], 5)
+
+    def test_runs_are_saved_in_batches(self):
+        reporter = self.create_reporter(save_delay=1000, batch_size=2)
+        reporter.last_save = time.time()
+        self.start(reporter, 'a')
+        self.assertEqual(self.db.bulk_updates, [])
+        self.start(reporter, 'b')
+        self.assertEqual(self.db.bulk_updates, [['a', 'b']])
+        reporter.experiment_info_updated({'x': 1}, {'x': 1}, 'a')
+        self.assertEqual(len(self.db.bulk_updates), 1)
+        reporter.experiment_completed_event(1, 5, {'x': 2}, None, 'a')
+        self.assertEqual(self.db.bulk_updates[-1], ['a'])
+        self.assertEqual(self.db['a']['info'], {'x': 2})
+        self.assertNotIn('a', reporter.experiment_entries)
+
+    def test_conflicts_are_retried_with_latest_revision(self):
+        reporter = self.create_reporter()
+        self.start(reporter, 'a')
+        self.db.touch('a')
+        reporter.experiment_completed_event(1, 5, {}, None, 'a')
+        self.assertEqual(self.db['a']['status'], 'COMPLETED')
+        self.assertEqual(self.db['a']['_rev'], '3')
+        self.assertEqual(len(self.db.bulk_updates), 3)
+
+    def test_too_many_conflicts_raise(self):
+        reporter = self.create_reporter(max_retries=1)
+        self.start(reporter, 'a')
+        original_update = self.db.update
+
+        def conflicting_update(docs):
+            for doc in docs:
+                self.db.touch(doc['_id'])
+            return original_update(docs)
+
+        self.db.update = conflicting_update
+        self.assertRaises(ResourceConflict, reporter.experiment_completed_event,
+                          1, 5, {}, None, 'a')
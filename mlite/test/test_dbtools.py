@@ -0,0 +1,85 @@
+#!/usr/bin/python
+# coding=utf-8
+from __future__ import division, print_function, unicode_literals
+import unittest
+from ..dbtools import describe_plan, explain_queries
+
+try:
+    from ..observers.mongodb import (DEFAULT_INDEXES, ensure_indexes,
+                                     missing_indexes, option_index)
+except ImportError:
+    DEFAULT_INDEXES = None
+
+
+class FakeCollection(object):
+    def __init__(self):
+        self.indexes = {'_id_': {'key': [('_id', 1)]}}
+
+    def create_index(self, keys, name=None, **kwargs):
+        name = name or '_'.join('{}_{}'.format(k, d) for k, d in keys)
+        self.indexes[name] = dict(kwargs, key=keys)
+        return name
+
+    def index_information(self):
+        return self.indexes
+
+    def find(self, query):
+        return FakeCursor(query)
+
+
+class FakeCursor(object):
+    def __init__(self, query):
+        self.query = query
+
+    def sort(self, sort):
+        return self
+
+    def explain(self):
+        if 'name' in self.query:
+            plan = {'stage': 'FETCH',
+                    'inputStage': {'stage': 'IXSCAN',
+                                   'indexName': 'name_1_start_time_-1'}}
+        else:
+            plan = {'stage': 'SORT', 'inputStage': {'stage': 'COLLSCAN'}}
+        return {'queryPlanner': {'winningPlan': plan}}
+
+
+class DescribePlanTest(unittest.TestCase):
+    def test_stages_with_index(self):
+        self.assertEqual(
+            describe_plan(FakeCursor({'name': 'a'}).explain()),
+            'FETCH > IXSCAN(name_1_start_time_-1)')
+
+    def test_slot_based_plan_and_multiple_inputs(self):
+        explanation = {'queryPlanner': {'winningPlan': {'queryPlan': {
+            'stage': 'OR', 'inputStages': [{'stage': 'IXSCAN',
+                                            'indexName': 'a_1'},
+                                           {'stage': 'IXSCAN',
+                                            'indexName': 'b_1'}]}}}}
+        self.assertEqual(describe_plan(explanation), 'OR > IXSCAN(a_1)')
+
+    def test_explain_queries(self):
+        plans = dict(explain_queries(FakeCollection(), 'a'))
+        self.assertEqual(plans['running experiments'], 'SORT > COLLSCAN')
+        self.assertEqual(plans['runs of an experiment'],
+                         'FETCH > IXSCAN(name_1_start_time_-1)')
+
+
+@unittest.skipIf(DEFAULT_INDEXES is None, 'pymongo is not installed')
+class IndexTest(unittest.TestCase):
+    def test_ensure_indexes_creates_missing_ones(self):
+        collection = FakeCollection()
+        indexes = list(DEFAULT_INDEXES) + [option_index('lr')]
+        self.assertEqual(missing_indexes(collection, indexes), indexes)
+        names = ensure_indexes(collection, indexes)
+        self.assertIn('running_start_time', names)
+        self.assertIn('name_1_options.lr_1', names)
+        self.assertEqual(missing_indexes(collection, indexes), [])
+
+    def test_partial_filter_has_to_match(self):
+        collection = FakeCollection()
+        collection.create_index([('start_time', -1)],
+                                name='running_start_time')
+        running = [i for i in DEFAULT_INDEXES
+                   if 'partialFilterExpression' in i]
+        self.assertEqual(missing_indexes(collection, running), running)
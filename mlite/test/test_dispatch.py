@@ -0,0 +1,224 @@
+#!/usr/bin/python
+# coding=utf-8
+from __future__ import division, print_function, unicode_literals
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from mlite.utils import NO_LOGGER
+from ..dispatch import BackgroundDispatcher, SynchronousDispatcher
+from ..experiment import Experiment
+from ..observers import ExperimentObserver, FileStorageObserver, load_run
+
+
+class DeltaObserver(ExperimentObserver):
+    """
+    Rebuilds info from the deltas of the events.
+    """
+    def __init__(self):
+        self.info = None
+
+    def experiment_started_event(self, start_time, options, run_seed, args,
+                                 kwargs, info, run_id, fingerprint):
+        self.info = dict(info)
+
+    def experiment_info_updated(self, info, delta, run_id):
+        for key, value in delta.changed.items():
+            self.info[key] = value
+        for key, items in delta.appended.items():
+            self.info[key] = self.info[key] + items
+        for key in delta.removed:
+            del self.info[key]
+
+    def experiment_completed_event(self, stop_time, result, info, delta,
+                                   run_id):
+        self.experiment_info_updated(info, delta, run_id)
+
+
+class RecordingObserver(ExperimentObserver):
+    def __init__(self, block=None):
+        self.events = []
+        self.block = block
+
+    def experiment_started_event(self, start_time, options, run_seed, args,
+                                 kwargs, info, run_id, fingerprint):
+        if self.block is not None:
+            self.block.wait()
+        self.events.append(('started', dict(info)))
+
+    def experiment_info_updated(self, info, delta, run_id):
+        self.events.append(('info', dict(info)))
+
+    def experiment_completed_event(self, stop_time, result, info, delta,
+                                   run_id):
+        self.events.append(('completed', result))
+
+
+class OldObserver(object):
+    # written before run_id, delta and fingerprint were added
+    def __init__(self):
+        self.events = []
+
+    def experiment_started_event(self, start_time, options, run_seed, args,
+                                 kwargs, info):
+        self.events.append('started')
+
+    def experiment_info_updated(self, info):
+        self.events.append('info')
+
+    def experiment_completed_event(self, stop_time, result, info):
+        self.events.append(('completed', result))
+
+
+class DispatcherTest(unittest.TestCase):
+    def test_observers_only_get_the_arguments_they_accept(self):
+        o = OldObserver()
+        ex = Experiment('test', seed=1, logger=NO_LOGGER, observers=[o])
+
+        @ex.main
+        def main():
+            ex._emit_info_updated()
+            return 7
+
+        self.assertEqual(ex.run(), 7)
+        self.assertEqual(o.events, ['started', 'info', ('completed', 7)])
+
+    def test_synchronous_dispatcher_ignores_missing_events(self):
+        o = RecordingObserver()
+        SynchronousDispatcher().emit([o, object()], 'experiment_info_updated',
+                                     {'info': {'a': 1}, 'delta': None,
+                                      'run_id': 'r'})
+        self.assertEqual(o.events, [('info', {'a': 1})])
+
+    def test_background_dispatcher_delivers_after_flush(self):
+        o = RecordingObserver()
+        d = BackgroundDispatcher()
+        d.emit([o], 'experiment_info_updated',
+               {'info': {'a': 1}, 'delta': None, 'run_id': 'r'})
+        d.emit([o], 'experiment_completed_event',
+               {'stop_time': 0, 'result': 3, 'info': {}, 'delta': None,
+                'run_id': 'r'})
+        d.flush()
+        self.assertEqual(o.events, [('info', {'a': 1}), ('completed', 3)])
+
+    def test_background_dispatcher_coalesces_info_updates(self):
+        block = threading.Event()
+        o = RecordingObserver(block)
+        d = BackgroundDispatcher()
+        d.emit([o], 'experiment_started_event',
+               {'start_time': 0, 'options': {}, 'run_seed': 0, 'args': (),
+                'kwargs': {}, 'info': {}, 'run_id': 'r',
+                'fingerprint': None})
+        info = {}
+        for i in range(10):
+            info['i'] = i
+            d.emit([o], 'experiment_info_updated',
+                   {'info': info, 'delta': None, 'run_id': 'r'})
+        block.set()
+        d.flush()
+        self.assertEqual(o.events, [('started', {}), ('info', {'i': 9})])
+
+    def test_experiment_with_async_observers_flushes_on_completion(self):
+        o = RecordingObserver()
+        ex = Experiment('test', seed=1, logger=NO_LOGGER, observers=[o],
+                        async_observers=True)
+
+        @ex.main
+        def main():
+            ex.info['a'] = 1
+            ex._emit_info_updated()
+            return 7
+
+        self.assertEqual(ex.run(), 7)
+        self.assertEqual(o.events, [('started', {}), ('info', {'a': 1}),
+                                    ('completed', 7)])
+
+    def test_errors_of_observers_are_not_swallowed(self):
+        class Broken(ExperimentObserver):
+            def experiment_info_updated(self, info, delta, run_id):
+                return info.missing_attribute
+
+        self.assertRaises(AttributeError, SynchronousDispatcher().emit,
+                          [object(), Broken()], 'experiment_info_updated',
+                          {'info': {}, 'delta': None, 'run_id': 'r'})
+
+    def test_close_delivers_queued_events_and_stops_thread(self):
+        o = RecordingObserver()
+        d = BackgroundDispatcher()
+        for i in range(3):
+            d.emit([o], 'experiment_completed_event',
+                   {'stop_time': 0, 'result': i, 'info': {}, 'delta': None,
+                    'run_id': 'r'})
+        thread = d._thread
+        d.close()
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(o.events, [('completed', i) for i in range(3)])
+        d.emit([o], 'experiment_completed_event',
+               {'stop_time': 0, 'result': 3, 'info': {}, 'delta': None,
+                'run_id': 'r'})
+        d.close()
+        self.assertEqual(o.events[-1], ('completed', 3))
+
+    def test_experiment_stops_dispatch_thread_when_run_ends(self):
+        ex = Experiment('test', seed=1, logger=NO_LOGGER,
+                        observers=[RecordingObserver()], async_observers=True)
+
+        threads = []
+
+        @ex.main
+        def main():
+            threads.append(ex._dispatcher._thread)
+            raise KeyboardInterrupt()
+
+        self.assertRaises(KeyboardInterrupt, ex.run)
+        self.assertFalse(threads[0].is_alive())
+
+    def test_coalesced_info_updates_keep_all_changes(self):
+        basedir = tempfile.mkdtemp()
+        block = threading.Event()
+        ex = Experiment('test', seed=1, logger=NO_LOGGER,
+                        observers=[RecordingObserver(block),
+                                   FileStorageObserver(basedir, save_delay=0)],
+                        async_observers=True)
+
+        @ex.main
+        def main():
+            ex.info['errors'] = []
+            for i in range(3):
+                ex.info['errors'].append(i)
+                ex.info['step'] = i
+                ex._emit_info_updated()
+            block.set()
+
+        try:
+            ex.run()
+            info = load_run(os.path.join(basedir, ex._run_id))['info']
+        finally:
+            shutil.rmtree(basedir)
+        self.assertEqual(info['errors'], [0, 1, 2])
+        self.assertEqual(info['step'], 2)
+
+    def test_info_updates_interleaved_with_metrics_are_snapshots(self):
+        basedir = tempfile.mkdtemp()
+        rebuilt = DeltaObserver()
+        ex = Experiment('test', seed=1, logger=NO_LOGGER,
+                        observers=[rebuilt,
+                                   FileStorageObserver(basedir, save_delay=0)],
+                        async_observers=True)
+
+        @ex.main
+        def main():
+            ex.info['errors'] = []
+            for i in range(200):
+                ex.info['errors'].append(i)
+                ex.log_scalar('loss', i)
+                ex._emit_info_updated()
+
+        try:
+            ex.run()
+            info = load_run(os.path.join(basedir, ex._run_id))['info']
+        finally:
+            shutil.rmtree(basedir)
+        self.assertEqual(info['errors'], list(range(200)))
+        self.assertEqual(rebuilt.info['errors'], list(range(200)))
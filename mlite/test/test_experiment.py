@@ -6,9 +6,11 @@ Some tests for the experiment class
 from __future__ import division, print_function, unicode_literals
 import inspect
 from mock import Mock
+import numpy as np
 import unittest
 import time
 from ..experiment import Experiment
+from ..observers import ExperimentObserver
 from ..stage import StageFunction
 from ..utils import NO_LOGGER
 
@@ -218,6 +220,7 @@ class ExperimentTest(unittest.TestCase):
         self.assertEqual(call_kwargs['args'], (1, 2))
         self.assertEqual(call_kwargs['kwargs'], {'c': 3})
         self.assertEqual(call_kwargs['info']['a'], 42)
+        run_id = call_kwargs['run_id']
         start_time = call_kwargs['start_time']
         self.assertGreaterEqual(start_time, t1)
         self.assertGreaterEqual(t2, start_time)
@@ -226,7 +229,128 @@ class ExperimentTest(unittest.TestCase):
         call_kwargs = m.experiment_completed_event.call_args[1]
         self.assertEqual(call_kwargs['result'], 7)
         self.assertEqual(call_kwargs['info']['a'], 42)
+        self.assertEqual(call_kwargs['run_id'], run_id)
         stop_time = call_kwargs['stop_time']
         self.assertGreaterEqual(stop_time, t1)
         self.assertGreaterEqual(t2, stop_time)
         self.assertGreaterEqual(stop_time, start_time)
+
+    def test_every_run_gets_a_new_run_id(self):
+        m = Mock()
+        ex = create_test_experiment()
+        ex.add_observer(m)
+
+        @ex.main
+        def foo():
+            return 1
+
+        ex.run()
+        ex.run()
+        run_ids = [c[1]['run_id']
+                   for c in m.experiment_started_event.call_args_list]
+        self.assertEqual(len(set(run_ids)), 2)
+
+    @unittest.skipIf(not hasattr(np.random, 'SeedSequence'),
+                     "requires numpy >= 1.17")
+    def test_pcg64_rnd_deterministic_per_run(self):
+        ex = Experiment('test', seed=1234567, logger=NO_LOGGER, rng='pcg64')
+
+        @ex.stage
+        def randomTest(rnd):
+            return rnd.integers(5, 1000000)
+
+        @ex.main
+        def mainfunc(rnd):
+            return randomTest(), rnd.integers(5, 1000000)
+
+        a = ex.run()
+        b = ex.run()
+        self.assertEqual(a, b)
+        self.assertNotEqual(a[0], a[1])
+
+    def test_stage_metrics_are_published_to_info(self):
+        ex = create_test_experiment()
+
+        @ex.stage
+        def foo():
+            return 1
+
+        @ex.main
+        def bar():
+            return foo() + foo()
+
+        ex.run()
+        metrics = ex.info['stage_metrics']
+        self.assertEqual(metrics['foo']['calls'], 2)
+        self.assertEqual(metrics['bar']['calls'], 1)
+        ex.run()
+        self.assertEqual(ex.info['stage_metrics']['foo']['calls'], 2)
+
+
+class ResultStore(ExperimentObserver):
+    def __init__(self):
+        self.fingerprints = dict()
+        self.results = dict()
+
+    def experiment_started_event(self, start_time, options, run_seed, args,
+                                 kwargs, info, run_id, fingerprint):
+        self.fingerprints[run_id] = fingerprint
+
+    def experiment_completed_event(self, stop_time, result, info, delta,
+                                   run_id):
+        self.results[self.fingerprints[run_id]] = result
+
+    def lookup_result(self, fingerprint):
+        return fingerprint in self.results, self.results.get(fingerprint)
+
+
+class ResultReuseTest(unittest.TestCase):
+    def create_experiment(self, store, calls, seed=1, options=None):
+        ex = Experiment('test', seed=seed, options=options, logger=NO_LOGGER,
+                        observers=[store], reuse_results=True)
+
+        @ex.main
+        def foo(a, b=1):
+            calls.append(a)
+            return a + b
+
+        return ex
+
+    def test_completed_runs_are_reused(self):
+        store = ResultStore()
+        calls = []
+        self.assertEqual(self.create_experiment(store, calls).run(2), 3)
+        self.assertEqual(self.create_experiment(store, calls).run(2), 3)
+        self.assertEqual(calls, [2])
+
+    def test_changed_inputs_are_not_reused(self):
+        store = ResultStore()
+        calls = []
+        self.create_experiment(store, calls).run(2)
+        self.create_experiment(store, calls).run(3)
+        self.create_experiment(store, calls).run(2, b=2)
+        self.create_experiment(store, calls, seed=2).run(2)
+        self.create_experiment(store, calls, options={'x': 1}).run(2)
+        self.assertEqual(calls, [2, 3, 2, 2, 2])
+        self.assertEqual(len(store.results), 5)
+
+    def test_rerun_ignores_stored_results(self):
+        store = ResultStore()
+        calls = []
+        ex = self.create_experiment(store, calls)
+        ex.run(2)
+        ex.rerun(2)
+        self.assertEqual(calls, [2, 2])
+        ex.reuse_results = False
+        ex.run(2)
+        self.assertEqual(calls, [2, 2, 2])
+
+    def test_observers_without_stored_results_are_skipped(self):
+        store = ResultStore()
+        calls = []
+        self.create_experiment(store, calls).run(2)
+        ex = self.create_experiment(store, calls)
+        ex._observers[:0] = [object(),
+                             Mock(spec=['experiment_started_event'])]
+        self.assertEqual(ex.run(2), 3)
+        self.assertEqual(calls, [2])
@@ -0,0 +1,133 @@
+#!/usr/bin/python
+# coding=utf-8
+from __future__ import division, print_function, unicode_literals
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from ..export import export_couchdb, export_mongodb, write_part
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+
+def create_run(i, finished=True):
+    run = {'_id': 'run{}'.format(i), 'name': 'ex',
+           'options': {'lr': 0.1 * i}, 'start_time': float(i),
+           'info': {'weights': np.arange(i + 1.)}}
+    if finished:
+        run['stop_time'] = i + 0.5
+    return run
+
+
+class FakeCouchDB(object):
+    def __init__(self):
+        self.docs = []
+
+    def save(self, doc):
+        self.docs.append(dict(doc, _rev='1'))
+
+    def changes(self, since, include_docs, limit):
+        results = [{'id': d['_id'], 'seq': i + 1, 'doc': d}
+                   for i, d in enumerate(self.docs)][since:since + limit]
+        return {'results': results,
+                'last_seq': results[-1]['seq'] if results else since}
+
+
+class WritePartTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_npz_columns(self):
+        path = os.path.join(self.directory, 'runs.npz')
+        write_part(path, [create_run(1), create_run(2)])
+        data = np.load(path, allow_pickle=True)
+        self.assertEqual(data['options.lr'].tolist(), [0.1, 0.2])
+        self.assertEqual(data['_id'].tolist(), ['run1', 'run2'])
+        self.assertEqual(data['info.weights'][1].tolist(), [0., 1., 2.])
+
+    def test_unknown_format_raises(self):
+        self.assertRaises(ValueError, write_part,
+                          os.path.join(self.directory, 'runs.csv'),
+                          [create_run(1)], 'csv')
+
+    @unittest.skipIf(h5py is None, 'h5py is not installed')
+    def test_hdf5_arrays_are_chunked_datasets(self):
+        path = os.path.join(self.directory, 'runs.h5')
+        write_part(path, [create_run(1), create_run(2)], 'hdf5')
+        with h5py.File(path, 'r') as f:
+            self.assertEqual(f['options.lr'][:].tolist(), [0.1, 0.2])
+            weights = f['info.weights']['1']
+            self.assertEqual(weights[:].tolist(), [0., 1., 2.])
+            self.assertIsNotNone(weights.chunks)
+            self.assertEqual(weights.compression, 'gzip')
+
+
+class IncrementalExportTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def load_ids(self, path):
+        return np.load(path, allow_pickle=True)['_id'].tolist()
+
+    @unittest.skipIf(mongomock is None, 'mongomock is not installed')
+    def test_mongodb_exports_only_new_finished_runs(self):
+        collection = mongomock.MongoClient().db.experiments
+        for i in range(4):
+            run = create_run(i, finished=i < 3)
+            run['info']['weights'] = run['info']['weights'].tolist()
+            collection.insert_one(run)
+        paths = export_mongodb(collection, self.directory, batch_size=2)
+        self.assertEqual([self.load_ids(p) for p in paths],
+                         [['run0', 'run1'], ['run2']])
+        self.assertEqual(export_mongodb(collection, self.directory), [])
+        collection.update_one({'_id': 'run3'}, {'$set': {'stop_time': 9}})
+        paths = export_mongodb(collection, self.directory)
+        self.assertEqual(os.path.basename(paths[0]), 'runs-000002.npz')
+        self.assertEqual(self.load_ids(paths[0]), ['run3'])
+
+    @unittest.skipIf(mongomock is None, 'mongomock is not installed')
+    def test_mongodb_exports_runs_written_late(self):
+        collection = mongomock.MongoClient().db.experiments
+        collection.insert_one({'_id': 'a', 'name': 'ex', 'stop_time': 10.})
+        self.assertEqual(len(export_mongodb(collection, self.directory)), 1)
+        # same stop_time and an earlier one written after the export
+        collection.insert_one({'_id': 'b', 'name': 'ex', 'stop_time': 10.})
+        collection.insert_one({'_id': 'c', 'name': 'ex', 'stop_time': 5.})
+        collection.insert_one({'_id': 'd', 'name': 'ex', 'stop_time': 1.})
+        paths = export_mongodb(collection, self.directory, overlap=6)
+        self.assertEqual(self.load_ids(paths[0]), ['c', 'b'])
+        self.assertEqual(export_mongodb(collection, self.directory,
+                                        overlap=6), [])
+        paths = export_mongodb(collection, self.directory)
+        self.assertEqual(self.load_ids(paths[0]), ['d'])
+
+    def test_couchdb_follows_changes_feed(self):
+        db = FakeCouchDB()
+        db.save(create_run(0))
+        db.save(create_run(1, finished=False))
+        paths = export_couchdb(db, self.directory)
+        self.assertEqual(self.load_ids(paths[0]), ['run0'])
+        db.save(create_run(1))
+        db.save(dict(create_run(2), name='other'))
+        paths = export_couchdb(db, self.directory, name='ex')
+        self.assertEqual(len(paths), 1)
+        self.assertEqual(self.load_ids(paths[0]), ['run1'])
+        self.assertNotIn('_rev', np.load(paths[0], allow_pickle=True))
+        with open(os.path.join(self.directory, 'export_state.json')) as f:
+            self.assertEqual(json.load(f), {'parts': 2, 'couchdb_seq': 4})
@@ -0,0 +1,91 @@
+#!/usr/bin/python
+# coding=utf-8
+from __future__ import division, print_function, unicode_literals
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from mlite.utils import NO_LOGGER
+from ..experiment import Experiment
+from ..observers import FileStorageObserver, load_run
+
+
+class FileStorageObserverTest(unittest.TestCase):
+    def setUp(self):
+        self.basedir = tempfile.mkdtemp()
+        self.observer = FileStorageObserver(self.basedir)
+        self.ex = Experiment('test', seed=3, options={'a': 2},
+                             observers=[self.observer], logger=NO_LOGGER)
+
+    def tearDown(self):
+        shutil.rmtree(self.basedir)
+
+    def run_experiment(self):
+        ex = self.ex
+
+        @ex.main
+        def main(a):
+            ex.info['errors'] = []
+            for i in range(3):
+                ex.info['errors'].append(i)
+                ex._emit_info_updated()
+            ex.info['weights'] = np.arange(5.)
+            return a * 21
+
+        ex.run()
+        run_dir, = os.listdir(self.basedir)
+        return os.path.join(self.basedir, run_dir)
+
+    def read_events(self, run_dir):
+        with open(os.path.join(run_dir, 'events.jsonl'), 'rb') as f:
+            return [json.loads(line.decode('utf-8')) for line in f]
+
+    def test_run_is_stored_in_directory_named_by_run_id(self):
+        run_dir = self.run_experiment()
+        self.assertEqual(os.path.basename(run_dir), self.ex._run_id)
+
+    def test_info_updates_only_contain_changes(self):
+        events = self.read_events(self.run_experiment())
+        self.assertEqual([e['event'] for e in events],
+                         ['started', 'info_updated', 'info_updated',
+                          'info_updated', 'completed'])
+        self.assertEqual(events[1]['info_set'], {'errors': [0]})
+        self.assertEqual(events[2]['info_append'], {'errors': [1]})
+        self.assertEqual(events[3]['info_append'], {'errors': [2]})
+        self.assertNotIn('info_set', events[3])
+
+    def test_arrays_are_stored_in_sidecar_files(self):
+        events = self.read_events(self.run_experiment())
+        weights = events[-1]['info_set']['weights']
+        self.assertEqual(weights['_type'], 'ndarray')
+
+    def test_load_run(self):
+        run = load_run(self.run_experiment())
+        self.assertEqual(run['name'], 'test')
+        self.assertEqual(run['options'], {'a': 2})
+        self.assertEqual(run['seed'], 3)
+        self.assertEqual(run['status'], 'COMPLETED')
+        self.assertEqual(run['result'], 42)
+        self.assertEqual(run['info']['errors'], [0, 1, 2])
+        self.assertIsInstance(run['info']['weights'], np.memmap)
+        self.assertTrue(np.all(run['info']['weights'] == np.arange(5.)))
+
+    def test_load_run_with_metrics(self):
+        ex = self.ex
+        ex.metric('loss', 'last', 4)
+
+        @ex.main
+        def main(a):
+            for i in range(6):
+                ex.log_scalar('loss', i * 0.5)
+                ex.log_scalar('acc', i)
+                ex._emit_info_updated()
+
+        ex.run()
+        run_dir, = os.listdir(self.basedir)
+        run = load_run(os.path.join(self.basedir, run_dir))
+        self.assertEqual(run['metrics']['loss'], {'steps': [2, 3, 4, 5],
+                                                  'values': [1, 1.5, 2, 2.5]})
+        self.assertEqual(run['metrics']['acc']['values'], list(range(6)))
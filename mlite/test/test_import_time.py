@@ -0,0 +1,31 @@
+#!/usr/bin/python
+# coding=utf-8
+from __future__ import division, print_function, unicode_literals
+import json
+import subprocess
+import sys
+import unittest
+
+IMPORT_SCRIPT = """
+import json, sys
+import mlite
+import mlite.experiment
+import mlite.observers
+print(json.dumps([m for m in ('matplotlib', 'matplotlib.pyplot', 'pymongo',
+                              'couchdb')
+                  if m in sys.modules]))
+"""
+
+
+class ImportTimeTest(unittest.TestCase):
+    def setUp(self):
+        output = subprocess.check_output([sys.executable, '-c',
+                                          IMPORT_SCRIPT])
+        self.modules = json.loads(output.decode('utf-8').strip())
+
+    def test_import_does_not_load_matplotlib(self):
+        self.assertNotIn('matplotlib', self.modules)
+        self.assertNotIn('matplotlib.pyplot', self.modules)
+
+    def test_import_does_not_load_optional_dependencies(self):
+        self.assertEqual(self.modules, [])
@@ -0,0 +1,183 @@
+#!/usr/bin/python
+# coding=utf-8
+from __future__ import division, print_function, unicode_literals
+from copy import deepcopy
+import unittest
+from mock import Mock
+from mlite.utils import NO_LOGGER
+from ..experiment import Experiment
+from ..info import InfoDelta, InfoDict
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+
+class InfoDictTest(unittest.TestCase):
+    def assertDelta(self, delta, changed=None, appended=None, removed=None):
+        self.assertEqual(delta.changed, changed or {})
+        self.assertEqual(delta.appended, appended or {})
+        self.assertEqual(delta.removed, removed or set())
+
+    def test_set_keys_are_changed(self):
+        info = InfoDict(a=1)
+        info['b'] = {'c': 2}
+        self.assertDelta(info.pop_delta(), changed={'a': 1, 'b': {'c': 2}})
+        self.assertDelta(info.pop_delta())
+        self.assertFalse(info.pop_delta())
+
+    def test_appends_to_lists(self):
+        info = InfoDict(errors=[3, 2])
+        info.pop_delta()
+        info['errors'].append(1)
+        info['errors'].extend([0])
+        self.assertDelta(info.pop_delta(), appended={'errors': [1, 0]})
+        info['errors'] += [-1]
+        self.assertDelta(info.pop_delta(), appended={'errors': [-1]})
+
+    def test_appends_to_new_lists_are_part_of_the_value(self):
+        info = InfoDict()
+        info.setdefault('errors', []).append(1)
+        self.assertDelta(info.pop_delta(), changed={'errors': [1]})
+
+    def test_other_list_modifications_change_the_key(self):
+        info = InfoDict(errors=[3, 2])
+        info.pop_delta()
+        info['errors'].append(1)
+        info['errors'][0] = 5
+        self.assertDelta(info.pop_delta(), changed={'errors': [5, 2, 1]})
+        info['errors'].pop()
+        self.assertDelta(info.pop_delta(), changed={'errors': [5, 2]})
+        info['errors'].sort()
+        self.assertDelta(info.pop_delta(), changed={'errors': [2, 5]})
+
+    def test_appends_to_the_assigned_list_are_picked_up(self):
+        info = InfoDict()
+        errors = []
+        info['errors'] = errors
+        errors.append(1)
+        self.assertEqual(info['errors'], [1])
+        self.assertDelta(info.pop_delta(), changed={'errors': [1]})
+        errors.extend([2, 3])
+        info['errors'].append(4)
+        self.assertDelta(info.pop_delta(), appended={'errors': [2, 3, 4]})
+        errors.append(5)
+        self.assertEqual(deepcopy(info), {'errors': [1, 2, 3, 4, 5]})
+        info['errors'] = [6]
+        errors.append(7)
+        self.assertEqual(info.get('errors'), [6])
+
+    def test_removed_keys(self):
+        info = InfoDict(a=1, b=2, c=3)
+        info.pop_delta()
+        del info['a']
+        info.pop('b')
+        info['b'] = 4
+        self.assertDelta(info.pop_delta(), changed={'b': 4}, removed={'a'})
+
+    def test_replaced_lists_are_no_longer_tracked(self):
+        info = InfoDict(errors=[1])
+        old_errors = info['errors']
+        info['errors'] = [2]
+        info.pop_delta()
+        old_errors.append(3)
+        self.assertDelta(info.pop_delta())
+
+    def test_mark_changed(self):
+        info = InfoDict(a={'b': 1})
+        info.pop_delta()
+        info['a']['b'] = 2
+        info.mark_changed('a')
+        self.assertDelta(info.pop_delta(), changed={'a': {'b': 2}})
+
+    def test_on_change(self):
+        info = InfoDict()
+        info.on_change = Mock()
+        info['errors'] = []
+        info['errors'].append(1)
+        del info['errors']
+        self.assertEqual(info.on_change.call_count, 3)
+
+    def test_copies_are_plain(self):
+        info = InfoDict(a=1, errors=[1, 2])
+        for copy in [deepcopy(info), pickle.loads(pickle.dumps(info, 2))]:
+            self.assertIs(type(copy), dict)
+            self.assertIs(type(copy['errors']), list)
+            self.assertEqual(copy, {'a': 1, 'errors': [1, 2]})
+
+
+class InfoDeltaTest(unittest.TestCase):
+    def test_update_merges_deltas(self):
+        delta = InfoDelta({'a': 1}, {'errors': [1]}, {'b'})
+        delta.update(InfoDelta({'b': 2}, {'errors': [2], 'a': [3]}, {'c'}))
+        self.assertEqual(delta.changed, {'a': 1, 'b': 2})
+        self.assertEqual(delta.appended, {'errors': [1, 2]})
+        self.assertEqual(delta.removed, {'c'})
+        delta.update(InfoDelta(removed={'errors'}))
+        self.assertEqual(delta.appended, {})
+        self.assertEqual(delta.removed, {'c', 'errors'})
+
+
+class ExperimentInfoTest(unittest.TestCase):
+    def test_observers_get_deltas(self):
+        m = Mock()
+        ex = Experiment('test', seed=1, logger=NO_LOGGER, observers=[m])
+
+        @ex.main
+        def main():
+            ex.info['errors'] = [1]
+            ex._emit_info_updated()
+            ex.info['errors'].append(2)
+            ex._emit_info_updated()
+
+        ex.info['a'] = 1
+        ex.run()
+        deltas = [c[1]['delta']
+                  for c in m.experiment_info_updated.call_args_list]
+        self.assertEqual(deltas[0].changed, {'errors': [1]})
+        self.assertEqual(deltas[1].changed, {})
+        self.assertEqual(deltas[1].appended, {'errors': [2]})
+        delta = m.experiment_completed_event.call_args[1]['delta']
+        self.assertEqual(list(delta.changed), ['stage_metrics'])
+
+    def test_appending_to_a_list_put_into_info(self):
+        m = Mock()
+        ex = Experiment('test', seed=1, logger=NO_LOGGER, observers=[m])
+
+        @ex.main
+        def main():
+            errors = []
+            ex.info['errors'] = errors
+            for i in range(3):
+                errors.append(i)
+                ex._emit_info_updated()
+
+        ex.run()
+        self.assertEqual(ex.info['errors'], [0, 1, 2])
+        deltas = [c[1]['delta']
+                  for c in m.experiment_info_updated.call_args_list]
+        self.assertEqual(deltas[0].changed, {'errors': [0]})
+        self.assertEqual([d.appended for d in deltas[1:]],
+                         [{'errors': [1]}, {'errors': [2]}])
+
+    def test_info_is_emitted_on_change(self):
+        m = Mock()
+        ex = Experiment('test', seed=1, logger=NO_LOGGER, observers=[m],
+                        info_update_interval=0)
+
+        @ex.main
+        def main():
+            ex.info['errors'] = []
+            for i in range(3):
+                ex.info['errors'].append(i)
+
+        ex.info['a'] = 1
+        ex.run()
+        self.assertEqual(m.experiment_info_updated.call_count, 4)
+
+    def test_info_assignment_keeps_tracking(self):
+        ex = Experiment('test', seed=1, logger=NO_LOGGER)
+        ex.info = {'a': 1}
+        self.assertIsInstance(ex.info, InfoDict)
+        self.assertEqual(ex.info, {'a': 1})
@@ -0,0 +1,175 @@
+#!/usr/bin/python
+# coding=utf-8
+from __future__ import division, print_function, unicode_literals
+import unittest
+from mock import Mock
+import numpy as np
+from mlite.utils import NO_LOGGER
+from ..experiment import Experiment
+from ..metrics import ScalarLog, apply_metrics, merge_metrics
+from ..pylstm import InfoUpdater
+
+
+class ScalarLogTest(unittest.TestCase):
+    def test_keeps_all_values_by_default(self):
+        log = ScalarLog()
+        for i in range(1000):
+            log.append(i * 0.5)
+        self.assertEqual(len(log), 1000)
+        self.assertTrue(np.all(log.steps == np.arange(1000)))
+        self.assertTrue(np.all(log.values == np.arange(1000) * 0.5))
+
+    def test_explicit_steps(self):
+        log = ScalarLog()
+        log.append(1., step=10)
+        log.append(2.)
+        log.append(3., step=20)
+        self.assertEqual(log.steps.tolist(), [10, 11, 20])
+
+    def test_last(self):
+        log = ScalarLog('last', 4)
+        for i in range(10):
+            log.append(i)
+        self.assertEqual(log.steps.tolist(), [6, 7, 8, 9])
+        self.assertEqual(log.values.tolist(), [6, 7, 8, 9])
+
+    def test_reservoir(self):
+        log = ScalarLog('reservoir', 100)
+        for i in range(10000):
+            log.append(i)
+        self.assertEqual(len(log), 100)
+        self.assertEqual(log.count, 10000)
+        self.assertTrue(np.all(np.diff(log.steps) > 0))
+        self.assertGreater(log.steps[-1], 5000)
+
+    def test_minmax_keeps_extremes(self):
+        log = ScalarLog('minmax', 64)
+        values = np.sin(np.arange(10000) / 100.)
+        values[1234] = -5
+        values[8765] = 5
+        for v in values:
+            log.append(v)
+        log.close()
+        self.assertLessEqual(len(log), 64)
+        self.assertTrue(np.all(np.diff(log.steps) > 0))
+        self.assertIn(1234, log.steps)
+        self.assertIn(8765, log.steps)
+        self.assertEqual(log.values.min(), -5)
+        self.assertEqual(log.values.max(), 5)
+        # the whole history is covered
+        self.assertLess(log.steps[0], 200)
+        self.assertGreater(log.steps[-1], 9800)
+
+    def test_export_is_incremental(self):
+        log = ScalarLog()
+        log.append(1.)
+        log.append(2.)
+        self.assertEqual(log.pop_export(), {'steps': [0, 1],
+                                            'values': [1., 2.],
+                                            'replace': False})
+        self.assertIsNone(log.pop_export())
+        log.append(3.)
+        self.assertEqual(log.pop_export(), {'steps': [2],
+                                            'values': [3.],
+                                            'replace': False})
+
+    def test_export_replaces_dropped_values(self):
+        log = ScalarLog('last', 4)
+        for i in range(3):
+            log.append(i)
+        self.assertFalse(log.pop_export()['replace'])
+        log.append(3)
+        log.append(4)
+        self.assertEqual(log.pop_export(), {'steps': [1, 2, 3, 4],
+                                            'values': [1., 2., 3., 4.],
+                                            'replace': True})
+
+    def test_exports_reconstruct_retained_values(self):
+        for retention in [None, 'last', 'reservoir', 'minmax']:
+            log = ScalarLog(retention, 16)
+            stored = dict()
+            pending = dict()
+            for i in range(201):
+                if i % 7 == 0 or i == 200:
+                    if i == 200:
+                        log.close()
+                    export = log.pop_export()
+                    if export is not None:
+                        apply_metrics(stored, {'m': export})
+                        merge_metrics(pending, {'m': export})
+                else:
+                    log.append(np.cos(i))
+            self.assertEqual(stored['m']['steps'], log.steps.tolist())
+            self.assertEqual(stored['m']['values'], log.values.tolist())
+            if pending['m']['replace']:
+                self.assertEqual(pending['m']['steps'], log.steps.tolist())
+
+    def test_unknown_retention_raises(self):
+        self.assertRaises(ValueError, ScalarLog, 'first', 10)
+        self.assertRaises(ValueError, ScalarLog, 'last')
+
+
+class ExperimentLogScalarTest(unittest.TestCase):
+    def test_metrics_are_sent_with_info_updates(self):
+        m = Mock()
+        ex = Experiment('test', seed=1, logger=NO_LOGGER, observers=[m])
+        ex.metric('loss', 'last', 4)
+
+        @ex.main
+        def main():
+            for i in range(3):
+                ex.log_scalar('loss', 1. / (i + 1), step=i)
+            ex._emit_info_updated()
+            ex.log_scalar('loss', 0.1)
+            ex.log_scalar('acc', 0.9)
+
+        ex.run()
+        calls = [c[1]['metrics']
+                 for c in m.experiment_metrics_updated.call_args_list]
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(calls[0]['loss']['steps'], [0, 1, 2])
+        self.assertEqual(calls[1]['loss'], {'steps': [3], 'values': [0.1],
+                                            'replace': False})
+        self.assertEqual(calls[1]['acc']['values'], [0.9])
+        self.assertEqual(ex.metric('loss').values.tolist(),
+                         [1., 0.5, 1. / 3, 0.1])
+
+    def test_metrics_are_cleared_for_each_run(self):
+        ex = Experiment('test', seed=1, logger=NO_LOGGER)
+
+        @ex.main
+        def main():
+            ex.log_scalar('loss', 1.)
+
+        ex.run()
+        ex.run()
+        self.assertEqual(ex.metric('loss').values.tolist(), [1.])
+
+
+class FakeNet(object):
+    architecture = 'fake'
+
+    def get_param_size(self):
+        return 10
+
+
+class InfoUpdaterTest(unittest.TestCase):
+    def test_errors_are_logged_anew_in_every_run(self):
+        m = Mock()
+        ex = Experiment('test', seed=1, logger=NO_LOGGER, observers=[m])
+        update_info = InfoUpdater(ex)
+
+        @ex.main
+        def main(epochs):
+            errors = []
+            for epoch in range(epochs):
+                errors.append(1. / (epoch + 1))
+                update_info(epoch, FakeNet(), errors, [])
+
+        ex.run(3)
+        ex.run(2)
+        self.assertEqual(ex.metric('training_errors').values.tolist(),
+                         [1., 0.5])
+        self.assertEqual(ex.info['epochs_needed'], 1)
+        first = m.experiment_metrics_updated.call_args_list[3][1]['metrics']
+        self.assertEqual(first['training_errors']['values'], [1.])
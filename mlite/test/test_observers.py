@@ -0,0 +1,221 @@
+#!/usr/bin/python
+# coding=utf-8
+from __future__ import division, print_function, unicode_literals
+import threading
+import time
+import unittest
+from mock import Mock, patch
+import numpy as np
+from ..info import InfoDict
+from ..observers.array_codec import decode_ndarray, encode_ndarray
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+try:
+    import mongomock
+    from ..observers.mongodb import (GridFSArray, MongoDBReporter,
+                                     PickleNumpyArrays, mark_dead_runs)
+except ImportError:
+    mongomock = None
+
+
+class FakeGridFS(object):
+    def __init__(self):
+        self.files = dict()
+        self.reads = 0
+
+    def exists(self, file_id):
+        return file_id in self.files
+
+    def put(self, data, _id):
+        self.files[_id] = data
+
+    def get(self, file_id):
+        self.reads += 1
+        return FakeGridOut(self.files[file_id])
+
+
+class FakeGridOut(object):
+    def __init__(self, data):
+        self.data = data
+
+    def read(self):
+        return self.data
+
+
+class ArrayCodecTest(unittest.TestCase):
+    def test_roundtrip(self):
+        for a in [np.arange(12.).reshape(3, 4), np.array(3, dtype=np.int8),
+                  np.zeros((0, 5), dtype=np.float32),
+                  np.arange(12).reshape(3, 4).T]:
+            for compression in [None, 'zlib']:
+                header, data = encode_ndarray(a, compression)
+                b = decode_ndarray(header, data)
+                self.assertEqual(a.dtype, b.dtype)
+                self.assertEqual(a.shape, b.shape)
+                self.assertTrue(np.all(a == b))
+
+    def test_header_describes_raw_buffer(self):
+        a = np.arange(6, dtype='<f8').reshape(2, 3)
+        header, data = encode_ndarray(a)
+        self.assertEqual(header, {'dtype': '<f8', 'shape': [2, 3],
+                                  'compression': None})
+        self.assertEqual(len(data), a.nbytes)
+
+    def test_decoding_does_not_copy(self):
+        header, data = encode_ndarray(np.arange(10.))
+        b = decode_ndarray(header, data)
+        self.assertFalse(b.flags.owndata)
+        self.assertFalse(b.flags.writeable)
+
+    def test_object_arrays_are_pickled(self):
+        a = np.array([{'a': 1}, None])
+        header, data = encode_ndarray(a)
+        self.assertEqual(header, {})
+        self.assertEqual(list(decode_ndarray(header, data)), [{'a': 1}, None])
+
+    def test_decodes_pickled_arrays(self):
+        a = np.arange(5)
+        data = pickle.dumps(a, protocol=2)
+        b = decode_ndarray({'_type': 'ndarray'}, data)
+        self.assertTrue(np.all(a == b))
+
+    def test_unknown_compression_raises(self):
+        with self.assertRaises(ValueError):
+            encode_ndarray(np.arange(3), 'foo')
+
+
+@unittest.skipIf(mongomock is None, 'pymongo or mongomock is not installed')
+class GridFSTest(unittest.TestCase):
+    def setUp(self):
+        self.fs = FakeGridFS()
+        self.collection = mongomock.MongoClient().db.experiments
+
+    def test_only_arrays_above_threshold_are_offloaded(self):
+        writer = PickleNumpyArrays(self.fs, gridfs_threshold=100)
+        big = np.arange(100.)
+        doc = writer.transform_incoming(
+            {'small': np.arange(3.), 'info': {'a': big, 'b': big.copy()}},
+            self.collection)
+        self.assertIn('_value', doc['small'])
+        self.assertNotIn('_value', doc['info']['a'])
+        self.assertEqual(doc['info']['a']['_gridfs_id'],
+                         doc['info']['b']['_gridfs_id'])
+        self.assertEqual(len(self.fs.files), 1)
+
+    def test_no_threshold_stores_nothing_in_gridfs(self):
+        writer = PickleNumpyArrays(self.fs, gridfs_threshold=None)
+        doc = writer.transform_incoming({'a': np.arange(100.)},
+                                        self.collection)
+        self.assertIn('_value', doc['a'])
+        self.assertEqual(self.fs.files, {})
+
+    def test_arrays_are_read_back_lazily(self):
+        writer = PickleNumpyArrays(self.fs, gridfs_threshold=0)
+        self.collection.insert_one(writer.transform_incoming(
+            {'_id': 1, 'info': {'a': np.arange(12.).reshape(3, 4)}},
+            self.collection))
+        reader = PickleNumpyArrays(self.fs, gridfs_threshold=None)
+        doc = reader.transform_outgoing(self.collection.find_one(),
+                                        self.collection)
+        a = doc['info']['a']
+        self.assertIsInstance(a, GridFSArray)
+        self.assertEqual(self.fs.reads, 0)
+        np.testing.assert_array_equal(np.asarray(a),
+                                      np.arange(12.).reshape(3, 4))
+        np.testing.assert_array_equal(a.load(), np.asarray(a))
+        self.assertEqual(self.fs.reads, 1)
+
+    def test_reporter_without_threshold_can_read(self):
+        reporter = MongoDBReporter(indexes=())
+        with patch('mlite.observers.mongodb.MongoClient'), \
+                patch('mlite.observers.mongodb.gridfs.GridFS',
+                      return_value=self.fs):
+            reporter.connect()
+        self.assertIs(reporter.manipulator.fs, self.fs)
+        self.assertIsNone(reporter.manipulator.gridfs_threshold)
+
+
+@unittest.skipIf(mongomock is None, 'pymongo or mongomock is not installed')
+class MongoHeartbeatTest(unittest.TestCase):
+    def setUp(self):
+        self.collection = mongomock.MongoClient().db.experiments
+
+    def create_reporter(self, heartbeat_interval):
+        reporter = MongoDBReporter(heartbeat_interval=heartbeat_interval)
+        reporter.collection = self.collection
+        reporter.manipulator = PickleNumpyArrays()
+        reporter.experiment_created_event('test', [], 1, 'test.py', None)
+        return reporter
+
+    def start(self, reporter, fingerprint=None):
+        info = InfoDict()
+        reporter.experiment_started_event(time.time(), {}, 1, (), {}, info,
+                                          'r', fingerprint)
+        return info
+
+    def test_heartbeat_is_updated_until_the_run_ends(self):
+        reporter = self.create_reporter(0.001)
+        beat = threading.Event()
+        original_update = self.collection.update_one
+
+        def update_one(spec, document, **kwargs):
+            result = original_update(spec, document, **kwargs)
+            if list(document['$set']) == ['heartbeat']:
+                beat.set()
+            return result
+
+        self.collection.update_one = update_one
+        info = self.start(reporter)
+        started = self.collection.find_one()['heartbeat']
+        self.assertTrue(beat.wait(5))
+        self.assertGreater(self.collection.find_one()['heartbeat'], started)
+        reporter.experiment_completed_event(time.time(), 1, info,
+                                            info.pop_delta(), 'r')
+        self.assertIsNone(reporter.heartbeat)
+
+    def test_runs_with_lapsed_heartbeat_are_marked_dead(self):
+        self.start(self.create_reporter(None))
+        self.start(self.create_reporter(None))
+        self.collection.update_one({}, {'$set': {'heartbeat': 0}})
+        self.assertEqual(mark_dead_runs(self.collection, 60), 1)
+        self.assertEqual(sorted(r['status'] for r in self.collection.find()),
+                         ['DIED', 'RUNNING'])
+        self.assertEqual(mark_dead_runs(self.collection, 60), 0)
+
+    def test_info_updates_can_be_unacknowledged(self):
+        reporter = MongoDBReporter(save_delay=0, unacknowledged_updates=True,
+                                   heartbeat_interval=None)
+        reporter.collection = Mock(wraps=self.collection)
+        reporter.manipulator = PickleNumpyArrays()
+        info = self.start(reporter)
+        info['a'] = 1
+        reporter.experiment_info_updated(info, info.pop_delta(), 'r')
+        write_concern = reporter.collection.with_options.call_args[1][
+            'write_concern']
+        self.assertEqual(write_concern.document, {'w': 0})
+        self.assertEqual(self.collection.find_one()['info']['a'], 1)
+        reporter.experiment_completed_event(time.time(), 2, info,
+                                            info.pop_delta(), 'r')
+        self.assertEqual(reporter.collection.with_options.call_count, 1)
+        self.assertEqual(self.collection.find_one()['result'], 2)
+
+    def test_lookup_result_returns_latest_completed_run(self):
+        for result, status in [(1, 'COMPLETED'), (2, 'COMPLETED'),
+                               (3, 'FAILED')]:
+            reporter = self.create_reporter(None)
+            info = self.start(reporter, 'f')
+            if status == 'COMPLETED':
+                reporter.experiment_completed_event(result, result, info,
+                                                    info.pop_delta(), 'r')
+            else:
+                reporter.experiment_failed_event(result, info,
+                                                 info.pop_delta(), 'r')
+        self.start(self.create_reporter(None), 'g')
+        reporter = self.create_reporter(None)
+        self.assertEqual(reporter.lookup_result('f'), (True, 2))
+        self.assertEqual(reporter.lookup_result('g'), (False, None))
+        self.assertEqual(reporter.lookup_result('h'), (False, None))
@@ -0,0 +1,152 @@
+#!/usr/bin/python
+# coding=utf-8
+from __future__ import division, print_function, unicode_literals
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from mlite.utils import NO_LOGGER
+from ..experiment import Experiment
+from ..plots import LivePlot
+
+try:
+    import matplotlib
+    matplotlib.use('Agg')
+    from ..pylstm import plot_train_and_val_error
+except ImportError:
+    matplotlib = None
+
+
+def slow_plot():
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots()
+    while True:
+        yield fig
+        time.sleep(0.05)
+
+
+class FakeNet(object):
+    architecture = 'fake'
+
+    def get_param_size(self):
+        return 10
+
+
+@unittest.skipIf(matplotlib is None, 'matplotlib is not installed')
+class LivePlotTest(unittest.TestCase):
+    def run_training(self, live_plot, epochs):
+        from ..pylstm import InfoUpdater
+        ex = Experiment('test', seed=1, logger=NO_LOGGER,
+                        observers=[live_plot])
+        update_info = InfoUpdater(ex)
+
+        @ex.main
+        def main():
+            training_errors = []
+            validation_errors = []
+            for epoch in range(epochs):
+                training_errors.append(1. / (epoch + 1))
+                validation_errors.append(1. / (epoch + 1) + (epoch % 3))
+                update_info(epoch, FakeNet(), training_errors,
+                            validation_errors)
+
+        ex.run()
+
+    def test_metrics_are_downsampled(self):
+        lp = LivePlot(plot_train_and_val_error, stop_at_completion=False,
+                      max_points=100)
+        self.run_training(lp, 1000)
+        log = lp.metrics['validation_errors']
+        self.assertLessEqual(len(log), 100)
+        self.assertEqual(log.count, 1000)
+        self.assertEqual(log.min, (999, 1. / 1000))
+
+    def test_blitting_redraws_only_changed_artists(self):
+        lp = LivePlot(plot_train_and_val_error, fps=1e6,
+                      stop_at_completion=False)
+        draws = []
+        original_draw = LivePlot.draw
+
+        def draw(self, artists):
+            draws.append(artists is self.fig)
+            original_draw(self, artists)
+
+        LivePlot.draw = draw
+        try:
+            self.run_training(lp, 100)
+        finally:
+            LivePlot.draw = original_draw
+        self.assertEqual(len(draws), 101)
+        # full redraws are only needed when the axes limits grow
+        self.assertLess(sum(draws), 10)
+        self.assertEqual(len(lp.artists), 3)
+        self.assertTrue(all(a.get_animated() for a in lp.artists))
+        self.assertIsNotNone(lp.background)
+        v_dot = lp.artists[2]
+        self.assertEqual(list(v_dot.get_xdata()), [99])
+
+    def test_plain_lists_in_info_are_plotted(self):
+        lp = LivePlot(plot_train_and_val_error, fps=1e6,
+                      stop_at_completion=False)
+        ex = Experiment('test', seed=1, logger=NO_LOGGER, observers=[lp])
+
+        @ex.main
+        def main():
+            ex.info['training_errors'] = [3., 2., 1.]
+            ex.info['validation_errors'] = [4., 2., 3.]
+            ex._emit_info_updated()
+
+        ex.run()
+        t_line, v_line, v_dot = lp.artists
+        self.assertEqual(list(t_line.get_ydata()), [3., 2., 1.])
+        self.assertEqual(list(v_line.get_xdata()), [0, 1, 2])
+        self.assertEqual(list(v_dot.get_xdata()), [1])
+        self.assertEqual(list(v_dot.get_ydata()), [2.])
+
+    def test_full_redraws_without_blitting(self):
+        lp = LivePlot(plot_train_and_val_error, fps=1e6,
+                      stop_at_completion=False, blit=False)
+        self.run_training(lp, 20)
+        self.assertEqual(lp.artists, [])
+        self.assertIsNone(lp.background)
+
+
+@unittest.skipIf(matplotlib is None, 'matplotlib is not installed')
+class SeparateProcessLivePlotTest(unittest.TestCase):
+    def setUp(self):
+        self.frame_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.frame_dir)
+
+    def run_experiment(self, live_plot, steps):
+        ex = Experiment('test', seed=1, logger=NO_LOGGER,
+                        observers=[live_plot])
+
+        @ex.main
+        def main():
+            for i in range(steps):
+                ex.log_scalar('loss', 1. / (i + 1))
+                ex._emit_info_updated()
+
+        start = time.time()
+        ex.run()
+        return time.time() - start
+
+    def test_frames_are_written(self):
+        lp = LivePlot(plot_train_and_val_error, fps=1e6,
+                      stop_at_completion=False, separate_process=True,
+                      frame_dir=self.frame_dir)
+        self.run_experiment(lp, 5)
+        frames = sorted(os.listdir(self.frame_dir))
+        self.assertGreater(len(frames), 0)
+        self.assertLessEqual(len(frames), 6)
+        self.assertEqual(frames[0], 'frame_000000.png')
+        self.assertIsNone(lp._renderer)
+
+    def test_slow_rendering_drops_frames(self):
+        lp = LivePlot(slow_plot, fps=1e6, stop_at_completion=False,
+                      separate_process=True, frame_dir=self.frame_dir)
+        self.run_experiment(lp, 50)
+        self.assertLess(len(os.listdir(self.frame_dir)), 40)
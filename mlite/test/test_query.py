@@ -0,0 +1,82 @@
+#!/usr/bin/python
+# coding=utf-8
+from __future__ import division, print_function, unicode_literals
+import unittest
+import numpy as np
+from ..query import build_filter, build_projection, query_runs, to_columns
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+
+
+RUNS = [
+    {'_id': 1, 'options': {'lr': 0.1, 'layers': 2, 'net': {'act': 'relu'}},
+     'result': 0.5, 'status': 'COMPLETED'},
+    {'_id': 2, 'options': {'lr': 0.01, 'layers': 3, 'net': {'act': 'tanh'}},
+     'result': 0.25, 'status': 'COMPLETED',
+     'metrics': {'loss': {'steps': [0, 1], 'values': [2., 1.]}}},
+    {'_id': 3, 'options': {'lr': 0.1, 'layers': 2, 'momentum': True},
+     'result': None, 'status': 'FAILED'},
+]
+
+
+class ToColumnsTest(unittest.TestCase):
+    def test_one_column_per_option(self):
+        columns = to_columns(RUNS)
+        self.assertEqual(columns['options.lr'].tolist(), [0.1, 0.01, 0.1])
+        self.assertEqual(columns['options.layers'].dtype, np.int64)
+        self.assertEqual(columns['options.net.act'].tolist(),
+                         ['relu', 'tanh', None])
+
+    def test_missing_numbers_are_nan(self):
+        columns = to_columns(RUNS)
+        self.assertEqual(columns['result'].dtype, np.float64)
+        self.assertTrue(np.isnan(columns['result'][2]))
+        self.assertEqual(columns['result'][:2].tolist(), [0.5, 0.25])
+
+    def test_incomplete_booleans_are_objects(self):
+        column = to_columns(RUNS)['options.momentum']
+        self.assertEqual(column.dtype, object)
+        self.assertEqual(column.tolist(), [None, None, True])
+        self.assertEqual(to_columns(RUNS[2:])['options.momentum'].dtype, bool)
+
+    def test_lists_become_arrays(self):
+        column = to_columns(RUNS)['metrics.loss.values']
+        self.assertIsNone(column[0])
+        self.assertTrue(np.all(column[1] == np.array([2., 1.])))
+
+
+class QueryTest(unittest.TestCase):
+    def test_filter(self):
+        self.assertEqual(build_filter('ex', ['COMPLETED', 'FAILED'],
+                                      {'net.act': 'relu'}),
+                         {'name': 'ex',
+                          'status': {'$in': ['COMPLETED', 'FAILED']},
+                          'options.net.act': 'relu'})
+        self.assertEqual(build_filter(status='COMPLETED'),
+                         {'status': 'COMPLETED'})
+
+    def test_projection_slices_metrics(self):
+        self.assertEqual(build_projection(['result'], ['loss'], 1),
+                         {'result': True,
+                          'metrics.loss.steps': {'$slice': -1},
+                          'metrics.loss.values': {'$slice': -1}})
+
+    @unittest.skipIf(mongomock is None, 'mongomock is not installed')
+    def test_query_runs(self):
+        collection = mongomock.MongoClient().db.experiments
+        for run in RUNS:
+            collection.insert_one(dict(run, name='ex'))
+        columns = query_runs(collection, name='ex', status='COMPLETED',
+                             options={'lr': 0.01}, fields=['result'],
+                             metrics=['loss'])
+        self.assertEqual(sorted(columns),
+                         ['_id', 'metrics.loss.steps', 'metrics.loss.values',
+                          'result'])
+        self.assertEqual(columns['result'].tolist(), [0.25])
+        self.assertEqual(columns['metrics.loss.values'][0].tolist(), [2., 1.])
+        columns = query_runs(collection, fields=['result'], sort=[('_id', -1)],
+                             batch_size=1)
+        self.assertEqual(columns['_id'].tolist(), [3, 2, 1])
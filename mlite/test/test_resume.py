@@ -0,0 +1,124 @@
+#!/usr/bin/python
+# coding=utf-8
+from __future__ import division, print_function, unicode_literals
+import os
+import shutil
+import tempfile
+import unittest
+from mlite.utils import NO_LOGGER, fingerprint
+from ..experiment import Experiment
+
+
+class Interrupt(object):
+    at = None
+
+
+def create_experiment(resume_dir, calls, interrupt, seed=1):
+    ex = Experiment('test', seed=seed, logger=NO_LOGGER,
+                    resume_dir=resume_dir)
+
+    @ex.resumable_stage
+    def prepare(rnd):
+        calls.append('prepare')
+        return rnd.randint(1000)
+
+    @ex.stage
+    def describe(data):
+        calls.append('describe')
+        return data
+
+    def main():
+        data = describe(prepare())
+        total = ex.load_checkpoint('total', 0)
+        start = ex.load_checkpoint('epoch', 0)
+        for epoch in range(start, 5):
+            if epoch == interrupt.at:
+                raise KeyboardInterrupt()
+            calls.append(epoch)
+            total += data
+            ex.save_checkpoint('total', total)
+            ex.save_checkpoint('epoch', epoch + 1)
+        return total
+
+    main.__module__ = 'test_resume'
+    ex.main(main)
+    return ex
+
+
+class ResumeTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_rerun_continues_from_last_checkpoint(self):
+        calls = []
+        interrupt = Interrupt()
+        interrupt.at = 3
+        ex = create_experiment(self.directory, calls, interrupt)
+        self.assertRaises(KeyboardInterrupt, ex.run)
+        self.assertEqual(calls, ['prepare', 'describe', 0, 1, 2])
+
+        del calls[:]
+        interrupt.at = None
+        result = ex.run()
+        self.assertEqual(calls, ['describe', 3, 4])
+        ref = create_experiment(None, [], Interrupt()).run()
+        self.assertEqual(result, ref)
+
+    def test_completed_run_removes_its_results(self):
+        calls = []
+        ex = create_experiment(self.directory, calls, Interrupt())
+        result = ex.run()
+        self.assertEqual(os.listdir(self.directory), [])
+        del calls[:]
+        self.assertEqual(ex.run(), result)
+        self.assertEqual(calls, ['prepare', 'describe', 0, 1, 2, 3, 4])
+
+    def test_runs_with_other_seed_start_over(self):
+        calls = []
+        interrupt = Interrupt()
+        interrupt.at = 1
+        ex = create_experiment(self.directory, calls, interrupt, seed=1)
+        self.assertRaises(KeyboardInterrupt, ex.run)
+        del calls[:]
+        create_experiment(self.directory, calls, Interrupt(), seed=2).run()
+        self.assertEqual(calls, ['prepare', 'describe', 0, 1, 2, 3, 4])
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+
+    def test_resume_directory_is_named_by_the_run_fingerprint(self):
+        interrupt = Interrupt()
+        interrupt.at = 1
+        ex = create_experiment(self.directory, [], interrupt)
+        self.assertRaises(KeyboardInterrupt, ex.run)
+        self.assertIsNotNone(ex._fingerprint)
+        self.assertEqual(os.listdir(self.directory), [ex._fingerprint])
+
+    def test_checkpoints_are_ignored_without_resume_dir(self):
+        calls = []
+        ex = create_experiment(None, calls, Interrupt())
+        ex.run()
+        self.assertIsNone(ex.load_checkpoint('epoch'))
+        ex.run()
+        self.assertEqual(calls.count('prepare'), 2)
+
+
+class FingerprintTest(unittest.TestCase):
+    def test_ignores_dict_order(self):
+        a = dict()
+        a['x'] = 1
+        a['y'] = {'z': [1, 2]}
+        b = dict()
+        b['y'] = {'z': [1, 2]}
+        b['x'] = 1
+        self.assertEqual(fingerprint('f', a), fingerprint('f', b))
+        self.assertNotEqual(fingerprint('f', a), fingerprint('g', a))
+        self.assertNotEqual(fingerprint(a, 1), fingerprint(a, 2))
+
+    def test_parts_are_delimited(self):
+        self.assertNotEqual(fingerprint('ab', 'c'), fingerprint('a', 'bc'))
+        self.assertNotEqual(fingerprint('ab'), fingerprint('a', 'b'))
+
+    def test_unpicklable_parts(self):
+        self.assertIsNone(fingerprint(lambda x: x))
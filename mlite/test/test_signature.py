@@ -326,3 +326,32 @@ class SignatureSpellsTest(unittest.TestCase):
                                  regex % "generic")
         self.assertRegexpMatches(Signature(onlykwrgs).__repr__(),
                                  regex % "onlykwrgs")
+
+    def test_construct_arguments_repeated_calls_use_current_options(self):
+        s = Signature(complex_function_name)
+        args, kwargs = s.construct_arguments([1], {}, {'b': 2})
+        self.assertEqual(kwargs, {'b': 2})
+        args, kwargs = s.construct_arguments([1], {}, {'c': 3})
+        self.assertEqual(kwargs, {'c': 3})
+        args, kwargs = s.construct_arguments([5], {}, {})
+        self.assertEqual(args, [5])
+        self.assertEqual(kwargs, {})
+
+    def test_construct_arguments_repeated_calls_raise_every_time(self):
+        s = Signature(bariza)
+        for i in range(2):
+            with self.assertRaisesRegexp(TypeError, ".*missing.*"):
+                s.construct_arguments([1], {}, {'b': 2})
+            with self.assertRaisesRegexp(TypeError, ".*unexpected.*"):
+                s.construct_arguments([1, 2, 3, 4], {}, {})
+            with self.assertRaisesRegexp(TypeError, ".*multiple values.*"):
+                s.construct_arguments([1], {'a': 4}, {})
+        args, kwargs = s.construct_arguments([1], {}, {'b': 2, 'c': 3})
+        self.assertEqual(kwargs, {'b': 2, 'c': 3})
+
+    def test_construct_arguments_caches_binding_plan_per_call_shape(self):
+        s = Signature(bariza)
+        s.construct_arguments([1], {'b': 2}, {'c': 3})
+        s.construct_arguments([4], {'b': 5}, {'c': 6})
+        s.construct_arguments([1, 2], {}, {'c': 3})
+        self.assertEqual(len(s._binding_plans), 2)
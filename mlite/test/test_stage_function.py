@@ -1,13 +1,19 @@
 #!/usr/bin/python
 # coding=utf-8
 from __future__ import division, print_function, unicode_literals
+import sys
+import types
 import unittest
+from mock import patch
+import numpy as np
 from mlite.utils import NO_LOGGER
-from ..stage import StageFunction
+from ..stage import StageFunction, StageMetrics
 
+HAS_GENERATOR_API = hasattr(np.random, 'SeedSequence')
 
-def create_stage(f):
-    s = StageFunction(f, default_options=())
+
+def create_stage(f, rng='legacy'):
+    s = StageFunction(f, default_options=(), rng=rng)
     s.seed = 0
     s.logger = NO_LOGGER
     return s
@@ -77,4 +83,93 @@ class StageFunctionTest(unittest.TestCase):
         test_stage.seed = 0
         test_stage(5)
         a2, = test_stage(1)
-        self.assertEqual(a1, a2)
\ No newline at end of file
+        self.assertEqual(a1, a2)
+
+
+@unittest.skipIf(not HAS_GENERATOR_API, "requires numpy >= 1.17")
+class PCG64StageFunctionTest(unittest.TestCase):
+    def test_stage_provides_generator(self):
+        def test(rnd):
+            return rnd
+
+        s = create_stage(test, rng='pcg64')
+        self.assertIsInstance(s(), np.random.Generator)
+
+    def test_stage_rnd_deterministic(self):
+        def test(rnd):
+            return rnd.integers(5, 1000000)
+
+        s = create_stage(test, rng='pcg64')
+        a = [s() for _ in range(100)]
+        s.seed = 0
+        b = [s() for _ in range(100)]
+        self.assertEqual(a, b)
+        self.assertEqual(len(set(a)), 100)
+
+    def test_stage_rnd_independent_per_call(self):
+        def test(k, rnd):
+            return [rnd.integers(5, 1000000) for _ in range(k)]
+
+        s = create_stage(test, rng='pcg64')
+        s(1)
+        a1, = s(1)
+        s.seed = 0
+        s(5)
+        a2, = s(1)
+        self.assertEqual(a1, a2)
+
+
+class RNGModeTest(unittest.TestCase):
+    def test_unknown_rng_raises(self):
+        with self.assertRaises(ValueError):
+            create_stage(lambda: None, rng='foo')
+
+    def test_pcg64_without_generator_api_raises(self):
+        # numpy < 1.17 has no numpy.random.Generator
+        old_random = types.ModuleType(str('numpy.random'))
+        with patch.dict(sys.modules, {'numpy.random': old_random}):
+            with self.assertRaises(ImportError) as cm:
+                create_stage(lambda rnd: rnd, rng='pcg64')
+        self.assertIn('numpy >= 1.17', '{}'.format(cm.exception))
+
+    def test_legacy_rng_works_without_generator_api(self):
+        s = create_stage(lambda rnd: rnd.randint(1000))
+        self.assertIsInstance(s.rnd, np.random.RandomState)
+        a = s()
+        s.seed = 0
+        self.assertEqual(s(), a)
+
+
+class StageMetricsTest(unittest.TestCase):
+    def test_stage_counts_calls_and_exceptions(self):
+        def test(fail=False):
+            if fail:
+                raise ValueError()
+
+        s = create_stage(test)
+        s()
+        s()
+        with self.assertRaises(ValueError):
+            s(fail=True)
+        summary = s.metrics.summary()
+        self.assertEqual(summary['calls'], 3)
+        self.assertEqual(summary['exceptions'], 1)
+        self.assertGreaterEqual(summary['total_time'], summary['max_time'])
+        self.assertGreaterEqual(summary['max_time'], summary['p50_time'])
+        self.assertGreaterEqual(summary['p50_time'], summary['min_time'])
+
+    def test_summary_without_calls(self):
+        self.assertEqual(StageMetrics().summary(), {'calls': 0,
+                                                    'exceptions': 0,
+                                                    'cache_hits': 0,
+                                                    'total_time': 0.0})
+
+    def test_percentiles_are_estimated_from_sample(self):
+        m = StageMetrics(sample_size=100)
+        for i in range(1000):
+            m.add(i / 1000.)
+        summary = m.summary()
+        self.assertEqual(summary['calls'], 1000)
+        self.assertEqual(summary['min_time'], 0.)
+        self.assertEqual(summary['max_time'], 0.999)
+        self.assertAlmostEqual(summary['p50_time'], 0.5, delta=0.15)
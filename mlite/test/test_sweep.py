@@ -0,0 +1,62 @@
+#!/usr/bin/python
+# coding=utf-8
+from __future__ import division, print_function, unicode_literals
+import unittest
+from mlite.utils import NO_LOGGER
+from ..experiment import Experiment
+from ..sweep import grid
+
+
+def create_sweep_experiment(seed=None):
+    ex = Experiment('sweep', seed=seed, options={'a': 1, 'b': 2,
+                                                 'big': {'a': 100}},
+                    logger=NO_LOGGER)
+
+    @ex.main
+    def main(a, b, rnd):
+        if a < 0:
+            raise ValueError('negative a')
+        return a * b, rnd.randint(0, 1000000)
+
+    return ex
+
+
+class SweepTest(unittest.TestCase):
+    def test_grid(self):
+        self.assertEqual(grid(a=[1, 2], b=[3]), [{'a': 1, 'b': 3},
+                                                 {'a': 2, 'b': 3}])
+        self.assertEqual(grid(), [{}])
+
+    def test_sweep_runs_every_override(self):
+        ex = create_sweep_experiment(seed=123)
+        results = sorted(ex.sweep(grid(a=[1, 2, 3], b=[10]), processes=2))
+        self.assertEqual([r.index for r in results], [0, 1, 2])
+        self.assertEqual([r.result[0] for r in results], [10, 20, 30])
+        self.assertEqual([r.options['a'] for r in results], [1, 2, 3])
+        self.assertTrue(all(r.error is None for r in results))
+
+    def test_sweep_resolves_option_sections(self):
+        ex = create_sweep_experiment(seed=123)
+        results = list(ex.sweep(['big'], processes=1))
+        self.assertEqual(results[0].result[0], 200)
+
+    def test_sweep_seeds_are_deterministic(self):
+        ex = create_sweep_experiment(seed=123)
+        r1 = sorted(ex.sweep([{}, {}], processes=2))
+        r2 = sorted(ex.sweep([{}, {}], processes=2))
+        self.assertEqual([r.seed for r in r1], [r.seed for r in r2])
+        self.assertEqual([r.result for r in r1], [r.result for r in r2])
+        self.assertNotEqual(r1[0].seed, r1[1].seed)
+        self.assertNotEqual(r1[0].result, r1[1].result)
+
+    def test_sweep_uses_seed_from_override(self):
+        ex = create_sweep_experiment()
+        result, = ex.sweep([{'seed': 42}], processes=1)
+        self.assertEqual(result.seed, 42)
+
+    def test_sweep_reports_failed_runs(self):
+        ex = create_sweep_experiment(seed=123)
+        results = sorted(ex.sweep([{'a': -1}, {'a': 1}], processes=2))
+        self.assertIsNone(results[0].result)
+        self.assertIn('negative a', results[0].error)
+        self.assertEqual(results[1].result[0], 2)
@@ -0,0 +1,117 @@
+#!/usr/bin/python
+# coding=utf-8
+from __future__ import division, print_function, unicode_literals
+import json
+import threading
+import time
+import unittest
+from mlite.utils import NO_LOGGER
+from ..experiment import Experiment
+from ..observers import ExperimentObserver
+from ..tracing import CPU_TIME_SCOPE, Tracer
+
+
+class TracerTest(unittest.TestCase):
+    def test_spans_record_parents(self):
+        t = Tracer()
+        with t.span('outer'):
+            with t.span('inner1'):
+                pass
+            with t.span('inner2', 'observer'):
+                pass
+        events = t.to_chrome_trace()['traceEvents']
+        self.assertEqual([e['name'] for e in events],
+                         ['outer', 'inner1', 'inner2'])
+        self.assertEqual([e['args']['parent'] for e in events], [-1, 0, 0])
+        self.assertEqual([e['cat'] for e in events],
+                         ['stage', 'stage', 'observer'])
+        self.assertTrue(all(e['ph'] == 'X' for e in events))
+        self.assertGreaterEqual(events[0]['dur'], events[1]['dur'])
+
+    def test_spans_in_other_threads_have_no_parent(self):
+        t = Tracer()
+
+        def work():
+            with t.span('thread'):
+                pass
+
+        with t.span('main'):
+            thread = threading.Thread(target=work)
+            thread.start()
+            thread.join()
+        events = t.to_chrome_trace()['traceEvents']
+        self.assertEqual(events[1]['name'], 'thread')
+        self.assertEqual(events[1]['args']['parent'], -1)
+        self.assertNotEqual(events[0]['tid'], events[1]['tid'])
+
+    def test_unfinished_spans_are_not_exported(self):
+        t = Tracer()
+        with t.span('outer'):
+            self.assertEqual(t.to_chrome_trace()['traceEvents'], [])
+
+    def test_spans_beyond_capacity_are_dropped(self):
+        t = Tracer(capacity=2)
+        for i in range(5):
+            with t.span('s'):
+                pass
+        trace = t.to_chrome_trace()
+        self.assertEqual(len(trace['traceEvents']), 2)
+        self.assertEqual(trace['otherData']['dropped_spans'], 3)
+        t.clear()
+        self.assertEqual(t.to_chrome_trace()['traceEvents'], [])
+
+    def test_limit_keeps_longest_spans(self):
+        t = Tracer()
+        for i in range(5):
+            with t.span('s{}'.format(i)):
+                if i in (1, 3):
+                    time.sleep(0.02)
+        trace = t.to_chrome_trace(limit=2)
+        self.assertEqual([e['name'] for e in trace['traceEvents']],
+                         ['s1', 's3'])
+        self.assertEqual([e['args']['id'] for e in trace['traceEvents']],
+                         [1, 3])
+        self.assertEqual(trace['otherData']['omitted_spans'], 3)
+        self.assertEqual(trace['otherData']['cpu_time_scope'],
+                         CPU_TIME_SCOPE)
+        self.assertEqual(len(t.to_chrome_trace()['traceEvents']), 5)
+
+    def test_trace_in_info_is_capped(self):
+        ex = Experiment('test', seed=1, logger=NO_LOGGER,
+                        tracer=Tracer(info_limit=3))
+
+        @ex.stage
+        def foo():
+            pass
+
+        @ex.main
+        def bar():
+            for i in range(10):
+                foo()
+
+        ex.run()
+        trace = ex.info['trace']
+        self.assertEqual(len(trace['traceEvents']), 3)
+        self.assertIn('bar', [e['name'] for e in trace['traceEvents']])
+        self.assertEqual(trace['otherData']['omitted_spans'], 8)
+
+    def test_experiment_attaches_trace_to_info(self):
+        ex = Experiment('test', seed=1, logger=NO_LOGGER, tracer=Tracer(),
+                        observers=[ExperimentObserver()])
+
+        @ex.stage
+        def foo():
+            ex._emit_info_updated()
+
+        @ex.main
+        def bar():
+            foo()
+
+        ex.run()
+        trace = json.loads(json.dumps(ex.info['trace']))
+        names = [e['name'] for e in trace['traceEvents']]
+        self.assertEqual(names, ['ExperimentObserver.experiment_started_event',
+                                 'bar', 'foo',
+                                 'ExperimentObserver.experiment_info_updated'])
+        parents = [e['args']['parent'] for e in trace['traceEvents']]
+        self.assertEqual(parents, [-1, -1, 1, 2])
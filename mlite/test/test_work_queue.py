@@ -0,0 +1,145 @@
+#!/usr/bin/python
+# coding=utf-8
+from __future__ import division, print_function, unicode_literals
+import threading
+import time
+import unittest
+from mock import Mock
+import numpy as np
+from mlite.utils import NO_LOGGER, Heartbeat
+from ..experiment import Experiment
+from ..work_queue import InMemoryWorkQueue, MongoWorkQueue, _run_job
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+
+
+def create_experiment():
+    ex = Experiment('test', seed=1, options={'a': 1, 'b': 2},
+                    logger=NO_LOGGER)
+
+    @ex.stage
+    def add(a, b):
+        if a < 0:
+            raise ValueError('negative')
+        return a + b
+
+    def main():
+        return add()
+
+    main.__module__ = 'test_work_queue'
+    ex.main(main)
+    return ex
+
+
+class WorkQueueTests(object):
+    def test_jobs_are_claimed_once_by_priority(self):
+        first = self.queue.put('test', {'a': 1})
+        urgent = self.queue.put('test', {'a': 2}, priority=1)
+        self.queue.put('other', {'a': 3})
+        self.assertEqual(self.queue.claim('test', 'w1')['_id'], urgent)
+        self.assertEqual(self.queue.claim('test', 'w2')['_id'], first)
+        self.assertIsNone(self.queue.claim('test', 'w3'))
+
+    def test_only_the_claiming_worker_updates_a_job(self):
+        job_id = self.queue.put('test', {})
+        self.queue.claim('test', 'w1')
+        self.assertFalse(self.queue.heartbeat(job_id, 'w2'))
+        self.assertTrue(self.queue.heartbeat(job_id, 'w1'))
+        self.assertTrue(self.queue.complete(job_id, 'w1', 3))
+        self.assertFalse(self.queue.heartbeat(job_id, 'w1'))
+
+    def test_stale_jobs_are_requeued(self):
+        job_id = self.queue.put('test', {})
+        self.queue.claim('test', 'w1')
+        self.assertEqual(self.queue.requeue_stale(60), 0)
+        time.sleep(0.01)
+        self.assertEqual(self.queue.requeue_stale(0.001), 1)
+        self.assertFalse(self.queue.complete(job_id, 'w1', 3))
+        self.assertEqual(self.queue.claim('test', 'w2')['attempts'], 1)
+
+    def test_worker_runs_queued_option_sets(self):
+        ex = create_experiment()
+        ids = ex.enqueue(self.queue, [{'a': 3}, {'b': 5}, {'a': -1}])
+        self.assertEqual(ex.work(self.queue, worker='w1'), 3)
+        jobs = [self.get(i) for i in ids]
+        self.assertEqual([j['status'] for j in jobs],
+                         ['COMPLETED', 'COMPLETED', 'FAILED'])
+        self.assertEqual([j.get('result') for j in jobs[:2]], [5, 6])
+        self.assertIn('negative', jobs[2]['error'])
+        self.assertEqual(ex.options, {'a': 1, 'b': 2})
+
+    def test_lost_claim_is_logged(self):
+        ex = create_experiment()
+        ex.logger = Mock()
+        job_id = self.queue.put('test', {})
+        self.queue.claim('test', 'w1')
+        self.queue.release(job_id, 'w1')
+        self.assertFalse(_run_job(ex, self.queue, job_id, 'w1', 60))
+        self.assertIn('Lost the claim', ex.logger.warning.call_args[0][0])
+        self.assertEqual(self.get(job_id)['status'], 'QUEUED')
+
+
+class InMemoryWorkQueueTest(WorkQueueTests, unittest.TestCase):
+    def setUp(self):
+        self.queue = InMemoryWorkQueue()
+
+    def get(self, job_id):
+        return self.queue.jobs[job_id]
+
+
+@unittest.skipIf(mongomock is None, 'mongomock is not installed')
+class MongoWorkQueueTest(WorkQueueTests, unittest.TestCase):
+    def setUp(self):
+        self.queue = MongoWorkQueue()
+        self.queue.collection = mongomock.MongoClient().db.queue
+
+    def get(self, job_id):
+        return self.queue.collection.find_one({'_id': job_id})
+
+    def test_array_options_are_encoded(self):
+        options = {'w': np.arange(3.), 'nested': {'v': np.ones(2)}}
+        self.queue.put('test', options)
+        self.assertIsInstance(options['w'], np.ndarray)
+        self.assertIsInstance(options['nested']['v'], np.ndarray)
+        stored = self.queue.collection.find_one()['options']['w']
+        self.assertEqual(stored['_type'], 'ndarray')
+        job = self.queue.claim('test', 'w1')
+        np.testing.assert_array_equal(job['options']['w'], np.arange(3.))
+
+
+class HeartbeatTest(unittest.TestCase):
+    def test_beats_until_stopped(self):
+        beats = []
+        done = threading.Event()
+
+        def beat():
+            beats.append(time.time())
+            if len(beats) == 3:
+                done.set()
+            raise IOError('ignored')
+
+        with Heartbeat(beat, 0.001):
+            done.wait(5)
+        count = len(beats)
+        time.sleep(0.01)
+        self.assertGreaterEqual(count, 3)
+        self.assertEqual(len(beats), count)
+
+    def test_stop_does_not_wait_for_hanging_beat(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def beat():
+            started.set()
+            release.wait(5)
+
+        heartbeat = Heartbeat(beat, 0.001)
+        heartbeat.start()
+        self.assertTrue(started.wait(5))
+        start = time.time()
+        heartbeat.stop(timeout=0.01)
+        self.assertLess(time.time() - start, 1)
+        release.set()
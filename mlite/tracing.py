@@ -0,0 +1,131 @@
+#!/usr/bin/python
+# coding=utf-8
+from __future__ import division, print_function, unicode_literals
+from contextlib import contextmanager
+import os
+import threading
+import time
+import numpy as np
+
+try:  # CPU time of the current thread where available
+    cpu_time = time.thread_time
+    CPU_TIME_SCOPE = 'thread'
+except AttributeError:  # before Python 3.7 only that of the whole process
+    cpu_time = getattr(time, 'process_time', None) or time.clock
+    CPU_TIME_SCOPE = 'process'
+
+SPAN_DTYPE = np.dtype([('name', np.int32),
+                       ('category', np.int32),
+                       ('parent', np.int64),
+                       ('thread', np.uint64),
+                       ('start', np.float64),
+                       ('duration', np.float64),
+                       ('cpu_time', np.float64)])
+
+
+class Tracer(object):
+    """
+    Records nested spans (like stage calls and observer notifications) with
+    their parent span, thread, wall time and CPU time. The CPU time is that
+    of the thread, or of the whole process (including other threads) before
+    Python 3.7, see CPU_TIME_SCOPE.
+
+    Spans are stored in a buffer that is preallocated for capacity spans.
+    Spans beyond that are only counted in dropped. Use to_chrome_trace to
+    export them in the Chrome trace event format, which can be viewed in
+    chrome://tracing or Perfetto. The trace an experiment stores in its info
+    only contains the info_limit longest spans, so the run document stays
+    small.
+    """
+    def __init__(self, capacity=100000, info_limit=1000):
+        self.capacity = capacity
+        self.info_limit = info_limit
+        self.dropped = 0
+        self._spans = np.zeros(capacity, dtype=SPAN_DTYPE)
+        self._count = 0
+        self._names = []
+        self._name_ids = dict()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self.dropped = 0
+            self._count = 0
+
+    @contextmanager
+    def span(self, name, category='stage'):
+        with self._lock:
+            idx = self._count
+            if idx >= self.capacity:
+                self.dropped += 1
+            else:
+                self._count += 1
+                name_id = self._get_name_id(name)
+                category_id = self._get_name_id(category)
+        if idx >= self.capacity:
+            yield
+            return
+        stack = self._get_stack()
+        span = self._spans[idx]
+        span['name'] = name_id
+        span['category'] = category_id
+        span['parent'] = stack[-1] if stack else -1
+        span['thread'] = threading.current_thread().ident
+        span['duration'] = -1
+        stack.append(idx)
+        start_cpu_time = cpu_time()
+        span['start'] = time.time()
+        try:
+            yield
+        finally:
+            span['duration'] = time.time() - span['start']
+            span['cpu_time'] = cpu_time() - start_cpu_time
+            stack.pop()
+
+    def to_chrome_trace(self, limit=None):
+        """
+        Return all finished spans (or only the limit longest ones) as a dict
+        in the Chrome trace event format.
+        """
+        pid = os.getpid()
+        spans = self._spans[:self._count]
+        finished = np.flatnonzero(spans['duration'] >= 0)
+        omitted = 0
+        if limit is not None and len(finished) > limit:
+            omitted = len(finished) - limit
+            longest = np.argsort(-spans['duration'][finished],
+                                 kind='mergesort')[:limit]
+            finished = np.sort(finished[longest])
+        events = []
+        for idx in finished:
+            s = spans[idx]
+            cpu_time_us = float(s['cpu_time']) * 1e6
+            events.append({'name': self._names[s['name']],
+                           'cat': self._names[s['category']],
+                           'ph': 'X',
+                           'ts': float(s['start']) * 1e6,
+                           'dur': float(s['duration']) * 1e6,
+                           'pid': pid,
+                           'tid': int(s['thread']),
+                           'args': {'id': int(idx),
+                                    'parent': int(s['parent']),
+                                    'cpu_time_us': cpu_time_us}})
+        return {'traceEvents': events,
+                'displayTimeUnit': 'ms',
+                'otherData': {'dropped_spans': self.dropped,
+                              'omitted_spans': omitted,
+                              'cpu_time_scope': CPU_TIME_SCOPE}}
+
+    def _get_stack(self):
+        try:
+            return self._local.stack
+        except AttributeError:
+            self._local.stack = []
+            return self._local.stack
+
+    def _get_name_id(self, name):
+        if name not in self._name_ids:
+            self._name_ids[name] = len(self._names)
+            self._names.append(name)
+        return self._name_ids[name]
@@ -1,11 +1,18 @@
 #!/usr/bin/python
 # coding=utf-8
 from __future__ import division, print_function, unicode_literals
+from collections import deque
+import hashlib
 import logging
-import sys
+import threading
 import numpy as np
 
-SEED_RANGE = 0, sys.maxsize // 10000
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+SEED_RANGE = 0, 2 ** 31 - 1
 
 
 def generate_seed(rnd=None):
@@ -15,6 +22,119 @@ def generate_seed(rnd=None):
         return rnd.randint(*SEED_RANGE)
 
 
+class GeneratorPool(object):
+    """
+    Provides a reproducible sequence of independent numpy Generators (using
+    the PCG64 bit generator) derived from a SeedSequence or an integer seed.
+
+    The i-th generator always comes from the i-th child of the seed sequence.
+    Children are spawned batch_size at a time so hot loops only pay for
+    creating the bit generator.
+    """
+    def __init__(self, seed, batch_size=64):
+        self._generator_api = import_generator_api()
+        seed_sequence_cls = self._generator_api[2]
+        if not isinstance(seed, seed_sequence_cls):
+            seed = seed_sequence_cls(seed)
+        self.seed_sequence = seed
+        self.batch_size = batch_size
+        self.nr_generated = 0
+        self._children = deque()
+
+    def next(self):
+        generator_cls, pcg64_cls, _ = self._generator_api
+        if not self._children:
+            self._children.extend(self.seed_sequence.spawn(self.batch_size))
+        self.nr_generated += 1
+        return generator_cls(pcg64_cls(self._children.popleft()))
+
+
+def fingerprint(*parts):
+    """
+    Return a sha1 hex digest that identifies the given parts. Strings are
+    hashed as utf-8, everything else is pickled with the items of dicts in a
+    fixed order. Returns None if a part cannot be pickled.
+    """
+    h = hashlib.sha1()
+    for part in parts:
+        if not isinstance(part, bytes):
+            if isinstance(part, type('')):
+                part = part.encode('utf-8')
+            else:
+                try:
+                    part = pickle.dumps(_canonical(part), protocol=2)
+                except (pickle.PicklingError, TypeError, AttributeError):
+                    return None
+        # the length prefix keeps e.g. ('ab', 'c') and ('a', 'bc') apart
+        h.update('{}:'.format(len(part)).encode('ascii'))
+        h.update(part)
+    return h.hexdigest()
+
+
+def _canonical(obj):
+    # equal dicts can iterate in different orders, which changes the pickle
+    if isinstance(obj, dict):
+        return sorted(((_canonical(k), _canonical(v)) for k, v in obj.items()),
+                      key=repr)
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_canonical(o) for o in obj)
+    return obj
+
+
+class Heartbeat(object):
+    """
+    Calls beat every interval seconds from a background thread between
+    start() and stop() (or within a with block). Exceptions raised by beat
+    are logged and do not stop the heartbeat. stop() waits at most timeout
+    seconds for a beat in progress (e.g. a hanging database call).
+    """
+    def __init__(self, beat, interval, logger=None):
+        self.beat = beat
+        self.interval = interval
+        self.logger = logger if logger is not None else NO_LOGGER
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._loop,
+                                        name='mlite-heartbeat')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=10):
+        if self._thread is not None:
+            self._stopped.set()
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                self.logger.warning("Heartbeat did not stop within %s "
+                                    "seconds.", timeout)
+            self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _loop(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.beat()
+            except Exception:
+                self.logger.exception("Heartbeat failed.")
+
+
+def import_generator_api():
+    try:
+        from numpy.random import Generator, PCG64, SeedSequence
+    except ImportError:
+        raise ImportError('rng="pcg64" depends on numpy >= 1.17. '
+                          'Run "pip install -U numpy" to install it.')
+    return Generator, PCG64, SeedSequence
+
+
 def create_basic_stream_logger(name, level=logging.INFO):
     logger = logging.getLogger(name)
     logger.setLevel(level)
@@ -0,0 +1,263 @@
+#!/usr/bin/python
+# coding=utf-8
+from __future__ import division, print_function, unicode_literals
+from copy import deepcopy
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from .sweep import _configure_run, _sweep_tasks
+from .utils import Heartbeat
+
+QUEUED, CLAIMED, COMPLETED, FAILED = 'QUEUED', 'CLAIMED', 'COMPLETED', 'FAILED'
+
+
+class MongoWorkQueue(object):
+    """
+    Queue of experiment runs stored as documents in a MongoDB collection.
+
+    Every job has the experiment name, the options and seed of the run and a
+    status: QUEUED jobs are claimed atomically by exactly one worker
+    (find-and-modify), which sends heartbeats while the run is CLAIMED and
+    finally marks it COMPLETED (with the result) or FAILED (with the
+    traceback). requeue_stale() puts jobs back whose worker stopped sending
+    heartbeats.
+    """
+    def __init__(self, url=None, db_name='mlizard_experiments',
+                 collection_name='queue'):
+        self.url = url
+        self.db_name = db_name
+        self.collection_name = collection_name
+        self.collection = None
+        self.manipulator = None
+
+    def connect(self):
+        if self.collection is not None:
+            return
+        from .observers.mongodb import MongoClient
+        self.collection = MongoClient(self.url)[self.db_name][
+            self.collection_name]
+        self.collection.create_index([('status', 1), ('name', 1),
+                                      ('priority', -1), ('queued_at', 1)])
+        self.collection.create_index([('status', 1), ('heartbeat', 1)])
+
+    def put(self, name, options, seed=None, priority=0):
+        """
+        Enqueue a run of the experiment name and return the id of the job.
+        """
+        self.connect()
+        job = _new_job(name, self._encode(options), seed, priority)
+        self.collection.insert_one(job)
+        return job['_id']
+
+    def claim(self, name, worker):
+        """
+        Return the queued job of the experiment name with the highest
+        priority (the oldest first) after assigning it to worker, or None.
+        """
+        from pymongo import ReturnDocument
+        self.connect()
+        now = time.time()
+        job = self.collection.find_one_and_update(
+            {'status': QUEUED, 'name': name},
+            {'$set': {'status': CLAIMED, 'worker': worker,
+                      'claimed_at': now, 'heartbeat': now}},
+            sort=[('priority', -1), ('queued_at', 1)],
+            return_document=ReturnDocument.AFTER)
+        if job is not None:
+            job = self._get_manipulator().transform_outgoing(job,
+                                                             self.collection)
+        return job
+
+    def heartbeat(self, job_id, worker):
+        """
+        Record that worker is still running the job. Returns False if the
+        job is not assigned to worker anymore.
+        """
+        return self._update(job_id, worker, {'heartbeat': time.time()})
+
+    def complete(self, job_id, worker, result):
+        return self._update(job_id, worker, {'status': COMPLETED,
+                                             'result': self._encode(result),
+                                             'stop_time': time.time()})
+
+    def fail(self, job_id, worker, error):
+        return self._update(job_id, worker, {'status': FAILED,
+                                             'error': error,
+                                             'stop_time': time.time()})
+
+    def release(self, job_id, worker):
+        """
+        Put a claimed job back into the queue.
+        """
+        return self._update(job_id, worker, {'status': QUEUED,
+                                             'worker': None})
+
+    def requeue_stale(self, timeout):
+        """
+        Put claimed jobs back into the queue whose last heartbeat is older
+        than timeout seconds. Returns their number.
+        """
+        self.connect()
+        return self.collection.update_many(
+            {'status': CLAIMED, 'heartbeat': {'$lt': time.time() - timeout}},
+            {'$set': {'status': QUEUED, 'worker': None},
+             '$inc': {'attempts': 1}}).modified_count
+
+    def _update(self, job_id, worker, fields):
+        self.connect()
+        return self.collection.update_one(
+            {'_id': job_id, 'status': CLAIMED, 'worker': worker},
+            {'$set': fields}).matched_count == 1
+
+    def _encode(self, value):
+        # store arrays like the MongoDBReporter does, which works in place
+        return self._get_manipulator().transform_incoming(
+            {'value': deepcopy(value)}, self.collection)['value']
+
+    def _get_manipulator(self):
+        if self.manipulator is None:
+            from .observers.mongodb import PickleNumpyArrays
+            self.manipulator = PickleNumpyArrays()
+        return self.manipulator
+
+
+class InMemoryWorkQueue(object):
+    """
+    Stand-in for the MongoWorkQueue that keeps the jobs in a dict, for tests
+    and for workers that are threads of the same process.
+    """
+    def __init__(self):
+        self.jobs = dict()
+        self._lock = threading.Lock()
+
+    def put(self, name, options, seed=None, priority=0):
+        job = _new_job(name, options, seed, priority)
+        with self._lock:
+            self.jobs[job['_id']] = job
+        return job['_id']
+
+    def claim(self, name, worker):
+        with self._lock:
+            queued = [j for j in self.jobs.values()
+                      if j['status'] == QUEUED and j['name'] == name]
+            if not queued:
+                return None
+            job = min(queued, key=lambda j: (-j['priority'], j['queued_at']))
+            now = time.time()
+            job.update(status=CLAIMED, worker=worker, claimed_at=now,
+                       heartbeat=now)
+            return deepcopy(job)
+
+    def heartbeat(self, job_id, worker):
+        return self._update(job_id, worker, {'heartbeat': time.time()})
+
+    def complete(self, job_id, worker, result):
+        return self._update(job_id, worker, {'status': COMPLETED,
+                                             'result': result,
+                                             'stop_time': time.time()})
+
+    def fail(self, job_id, worker, error):
+        return self._update(job_id, worker, {'status': FAILED,
+                                             'error': error,
+                                             'stop_time': time.time()})
+
+    def release(self, job_id, worker):
+        return self._update(job_id, worker, {'status': QUEUED,
+                                             'worker': None})
+
+    def requeue_stale(self, timeout):
+        count = 0
+        with self._lock:
+            for job in self.jobs.values():
+                if (job['status'] == CLAIMED and
+                        job['heartbeat'] < time.time() - timeout):
+                    job.update(status=QUEUED, worker=None,
+                               attempts=job['attempts'] + 1)
+                    count += 1
+        return count
+
+    def _update(self, job_id, worker, fields):
+        with self._lock:
+            job = self.jobs[job_id]
+            if job['status'] != CLAIMED or job['worker'] != worker:
+                return False
+            job.update(fields)
+            return True
+
+
+def _new_job(name, options, seed, priority):
+    return {'_id': uuid.uuid4().hex, 'name': name, 'options': options,
+            'seed': seed, 'priority': priority, 'status': QUEUED,
+            'queued_at': time.time(), 'worker': None, 'attempts': 0}
+
+
+def enqueue(experiment, queue, overrides, priority=0):
+    """
+    Enqueue a run of the experiment for every entry in overrides (dicts
+    or names of option sections, see run_sweep), each with its own seed
+    derived from the experiment seed. Returns the ids of the jobs.
+    """
+    return [queue.put(experiment.__name__, options, seed, priority)
+            for _, options, seed in _sweep_tasks(experiment, overrides)]
+
+
+def run_worker(experiment, queue, worker=None, heartbeat_interval=30,
+               poll_interval=None, max_runs=None):
+    """
+    Claim queued runs of the experiment and execute them with experiment.run
+    until the queue is empty (or keep polling every poll_interval seconds)
+    or max_runs runs were executed. While a run is executed a heartbeat is
+    sent every heartbeat_interval seconds. Returns the number of runs.
+    """
+    worker = worker or '{}:{}'.format(socket.gethostname(), os.getpid())
+    base_options = deepcopy(experiment.options)
+    base_seed = experiment.seed
+    runs = 0
+    try:
+        while max_runs is None or runs < max_runs:
+            job = queue.claim(experiment.__name__, worker)
+            if job is None:
+                if poll_interval is None:
+                    break
+                time.sleep(poll_interval)
+                continue
+            runs += 1
+            _configure_run(experiment, base_options, job['options'],
+                           job['seed'])
+            _run_job(experiment, queue, job['_id'], worker,
+                     heartbeat_interval)
+    finally:
+        experiment.options.clear()
+        experiment.options.update(base_options)
+        experiment.seed = base_seed
+    return runs
+
+
+def _run_job(experiment, queue, job_id, worker, heartbeat_interval):
+    lost = threading.Event()
+
+    def beat():
+        if not queue.heartbeat(job_id, worker) and not lost.is_set():
+            lost.set()
+            experiment.logger.warning(
+                "Job %s is not assigned to %s anymore (it was requeued or "
+                "finished elsewhere). Its outcome will not be stored.",
+                job_id, worker)
+
+    with Heartbeat(beat, heartbeat_interval, experiment.logger):
+        try:
+            result = experiment.run()
+        except KeyboardInterrupt:
+            queue.release(job_id, worker)
+            raise
+        except Exception:
+            stored = queue.fail(job_id, worker, traceback.format_exc())
+        else:
+            stored = queue.complete(job_id, worker, result)
+    if not stored:
+        experiment.logger.warning("Lost the claim on job %s, its outcome was "
+                                  "not stored.", job_id)
+    return stored